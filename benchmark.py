@@ -0,0 +1,215 @@
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import cv2
+import numpy as np
+import pandas as pd
+
+import ibkr
+import ocr
+from row_parser import parse_rows
+from config import BENCH_BASELINE_PATH, BENCH_MIN_REGRESSION_MS, BENCH_REGRESSION_THRESHOLD
+from signal_store import SIGNAL_COLUMNS, SqliteSignalStore
+
+# Shaped like load_symbol_config(): every symbol carries every sheet column (NaN when blank)
+SYMBOL_CONFIG = pd.DataFrame([
+    {"Symbol": "AAPL", "Type": "Stock", "WaitDevs": 1, "MaxOrders": 15, "PercentCapital": 0.02, "FixedForexUSD": np.nan},
+    {"Symbol": "MSFT", "Type": "Stock", "WaitDevs": 2, "MaxOrders": 10, "PercentCapital": 0.03, "FixedForexUSD": np.nan},
+    {"Symbol": "EUR.USD", "Type": "Forex", "WaitDevs": 1, "MaxOrders": 15, "PercentCapital": np.nan, "FixedForexUSD": 100000},
+    {"Symbol": "USD.JPY", "Type": "Forex", "WaitDevs": 3, "MaxOrders": 5, "PercentCapital": np.nan, "FixedForexUSD": 50000},
+]).set_index("Symbol").to_dict(orient="index")
+TICK_SIZES = {"AAPL": 0.01, "MSFT": 0.01, "EUR.USD": 0.0001, "USD.JPY": 0.01, "AUD.NZD": 0.0001}
+SYMBOLS = list(SYMBOL_CONFIG) + ["UNKNOWN"]
+
+
+def synthetic_signals(n, seed=0):
+    """A cleaned signal frame (as clean_signals returns it) with n random rows."""
+    rng = np.random.default_rng(seed)
+    mid = rng.uniform(0.5, 300.0, n)
+    spread = mid * rng.uniform(0, 5e-4, n)
+    eq_level = rng.choice([0.0, 1.0], n, p=[0.05, 0.95]) * rng.uniform(-5, 5, n)
+    return pd.DataFrame({
+        "SignalDate": "2025-08-13",
+        "SignalTime": pd.to_datetime(rng.integers(0, 86400, n), unit="s").strftime("%H:%M:%S"),
+        "Symbol": rng.choice(SYMBOLS, n),
+        "Signal": rng.choice(["LongTrigger", "ShortTrigger"], n),
+        "BidPrice": mid - spread,
+        "AskPrice": mid + spread,
+        "LastPrice": mid * (1 + rng.normal(0, 0.005, n)),
+        "EqPrice": mid * (1 + rng.normal(0, 0.002, n)),
+        "EqLevel": eq_level,
+        "Bias": rng.uniform(-1, 1, n),
+    })
+
+
+def bench_signal_engine(rows):
+    df = synthetic_signals(rows)
+    start = time.perf_counter()
+    ibkr.compute_signal_columns(df, TICK_SIZES, SYMBOL_CONFIG)
+    elapsed = time.perf_counter() - start
+    print(f"compute_signal_columns {rows:>9,} rows: {elapsed:8.3f}s  {rows / elapsed:12,.0f} rows/s")
+
+
+# ========= STAGE SUITE =========
+def raw_signals(n, seed=0):
+    """Signal rows as the store holds them: OCR text, with some duplicates and zero quotes."""
+    df = synthetic_signals(n, seed)
+    df.loc[df.sample(frac=0.02, random_state=seed).index, "BidPrice"] = 0
+    df = pd.concat([df, df.sample(frac=0.05, random_state=seed)], ignore_index=True)
+    return df[SIGNAL_COLUMNS].astype(str)
+
+def ocr_rows(n, seed=0):
+    """Raw OCR rows (whole line in the first cell) with glued date/time, seconds past 59 and 'o' misreads."""
+    df = raw_signals(n, seed)
+    rng = np.random.default_rng(seed)
+    seconds = rng.integers(0, 66, len(df))
+    times = df["SignalTime"].str[:6] + pd.Series(seconds).map("{:02d}".format)
+    glue = np.where(rng.random(len(df)) < 0.1, "", " ")
+    symbols = df["Symbol"].str.replace(".", "", regex=False)
+    prices = df["LastPrice"].str.replace("9", "o", n=1, regex=False)
+    lines = (df["SignalDate"] + glue + times + " " + symbols + " " + df["Signal"] + " " + df["BidPrice"] + " "
+             + df["AskPrice"] + " " + prices + " " + df["EqPrice"] + " " + df["EqLevel"] + " " + df["Bias"])
+    return [[line, signal] for line, signal in zip(lines, df["Signal"])]
+
+def time_stage(fn, repeat, setup=None):
+    """
+    Call fn(setup()) repeat times (setup is untimed), then once more under
+    tracemalloc. Returns the per-call latencies in seconds and the peak memory
+    that call allocated in bytes (Python and numpy; not child processes such as Tesseract).
+    """
+    latencies = []
+    for _ in range(repeat):
+        arg = setup() if setup is not None else None
+        start = time.perf_counter()
+        fn(arg)
+        latencies.append(time.perf_counter() - start)
+
+    # Traced apart from the timed calls, which tracemalloc would slow down
+    arg = setup() if setup is not None else None
+    tracemalloc.start()
+    try:
+        fn(arg)
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return np.array(latencies), peak
+
+def stage_result(name, rows, measured):
+    latencies, peak = measured
+    p50, p95 = np.percentile(latencies, [50, 95])
+    result = {
+        "p50_ms": p50 * 1000,
+        "p95_ms": p95 * 1000,
+        "rows_per_s": rows / p50 if p50 > 0 else None,
+        "rows": rows,
+        "peak_alloc_mb": peak / 2**20,
+    }
+    print(f"{name:<32} p50 {result['p50_ms']:10.3f}ms  p95 {result['p95_ms']:10.3f}ms  "
+          f"{result['rows_per_s'] or 0:14,.0f} rows/s  peak alloc {result['peak_alloc_mb']:8.1f} MB")
+    return result
+
+def bench_ocr_stages(image_path, repeat):
+    results = {}
+    image = cv2.imread(image_path)
+    if image is None:
+        print(f"⚠️ {image_path} not found, skipping OCR stages")
+        return results
+
+    rows = ocr.extract_table(image, use_cache=False)
+    n_rows = len(rows)
+    results["extract_table"] = stage_result(
+        "extract_table", n_rows, time_stage(lambda _: ocr.extract_table(image, use_cache=False), repeat))
+    ocr.extract_table(image)
+    results["extract_table[cached]"] = stage_result(
+        "extract_table[cached]", n_rows, time_stage(lambda _: ocr.extract_table(image), repeat))
+
+    try:
+        ocr.ocr_table(image, rows)
+    except ocr.pytesseract.TesseractNotFoundError:
+        print("⚠️ tesseract not installed, skipping ocr_table")
+        return results
+    results["ocr_table"] = stage_result(
+        "ocr_table", n_rows, time_stage(lambda _: ocr.ocr_table(image, rows), max(1, repeat // 5)))
+    return results
+
+def bench_signal_stages(sizes, repeat):
+    results = {}
+    for n in sizes:
+        rows = ocr_rows(n)
+        results[f"parse_rows[{n}]"] = stage_result(
+            f"parse_rows[{n}]", len(rows), time_stage(lambda _: parse_rows(rows), repeat))
+
+        raw = raw_signals(n)
+        rows = raw.values.tolist()
+        with tempfile.TemporaryDirectory() as tmp:
+            store = SqliteSignalStore(os.path.join(tmp, "bench.db"))
+            results[f"append_signals[{n}]"] = stage_result(
+                f"append_signals[{n}]", len(rows), time_stage(lambda _: store.append_signals(rows), repeat))
+            store.close()
+
+        results[f"clean_signals[{n}]"] = stage_result(
+            f"clean_signals[{n}]", len(raw), time_stage(ibkr.clean_signals, repeat, setup=raw.copy))
+
+        cleaned = ibkr.clean_signals(raw.copy())
+        results[f"compute_signal_columns[{n}]"] = stage_result(
+            f"compute_signal_columns[{n}]", len(cleaned),
+            time_stage(lambda _: ibkr.compute_signal_columns(cleaned, TICK_SIZES, SYMBOL_CONFIG), repeat))
+    return results
+
+def compare_to_baseline(results, baseline, threshold):
+    """Names of the stages whose p50 grew more than threshold (fraction) and BENCH_MIN_REGRESSION_MS over the baseline."""
+    regressions = []
+    for name, result in results.items():
+        before = baseline.get(name)
+        if before is None or not before.get("p50_ms"):
+            continue
+        change = result["p50_ms"] / before["p50_ms"] - 1
+        if change > threshold and result["p50_ms"] - before["p50_ms"] > BENCH_MIN_REGRESSION_MS:
+            regressions.append(name)
+            print(f"❌ {name}: p50 {before['p50_ms']:.3f}ms -> {result['p50_ms']:.3f}ms (+{change:.0%})")
+    return regressions
+
+def run_suite(args):
+    results = {}
+    results.update(bench_ocr_stages(args.image, args.repeat))
+    results.update(bench_signal_stages(args.sizes, args.repeat))
+
+    if args.save_baseline:
+        with open(args.baseline, "w") as f:
+            json.dump(results, f, indent=2)
+        print(f"💾 Saved baseline for {len(results)} stages to {args.baseline}")
+        return 0
+    if not os.path.exists(args.baseline):
+        print(f"ℹ️ No baseline at {args.baseline}; run with --save-baseline to create one")
+        return 0
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+    regressions = compare_to_baseline(results, baseline, args.threshold)
+    if regressions:
+        print(f"❌ {len(regressions)} stages regressed beyond {args.threshold:.0%}")
+        return 1
+    print(f"✅ No stage regressed beyond {args.threshold:.0%} of {args.baseline}")
+    return 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Signal engine throughput and stage benchmarks.")
+    parser.add_argument("--rows", type=int, nargs="+", default=[10_000, 1_000_000])
+    parser.add_argument("--suite", action="store_true", help="time each OCR/signal stage and compare to the baseline")
+    parser.add_argument("--image", default="table.png")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[100, 10_000, 100_000])
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument("--baseline", default=BENCH_BASELINE_PATH)
+    parser.add_argument("--save-baseline", action="store_true")
+    parser.add_argument("--threshold", type=float, default=BENCH_REGRESSION_THRESHOLD,
+                        help="allowed p50 slowdown as a fraction (0.25 = 25%%)")
+    args = parser.parse_args()
+    if args.suite:
+        sys.exit(run_suite(args))
+    for rows in args.rows:
+        bench_signal_engine(rows)
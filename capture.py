@@ -0,0 +1,158 @@
+import glob
+import logging
+import os
+import sys
+import time
+
+import cv2
+import numpy as np
+
+from config import OCR_CAPTURE_ROI, OCR_DIFF_MARGIN, OCR_DIFF_SCALE, OCR_DIFF_THRESHOLD, OCR_WINDOW_REFRESH
+
+log = logging.getLogger(__name__)
+
+
+class ScreenSource:
+    """
+    Grabs the Triggers List window straight into a BGR NumPy frame.
+    The window handle and its client-area geometry are looked up once and only
+    refreshed every OCR_WINDOW_REFRESH seconds (or when a grab fails), and only
+    the client area, optionally narrowed to roi=(x, y, w, h), is captured.
+    Nothing touches the disk unless debug_dump is set.
+    """
+
+    def __init__(self, title="Triggers List", debug_dump=False, dump_path="table.png", roi=OCR_CAPTURE_ROI):
+        # Imported here so the OCR pipeline can run headless with ReplaySource
+        import pyautogui
+        import pygetwindow as gw
+        self.pyautogui = pyautogui
+        self.gw = gw
+        self.title = title
+        self.debug_dump = debug_dump
+        self.dump_path = dump_path
+        self.roi = roi
+        self.window = None
+        self.region = None
+        self.located_at = float("-inf")
+
+    def _locate(self):
+        if self.window is None or not self.window.visible:
+            windows = [w for w in self.gw.getWindowsWithTitle(self.title) if w.visible]
+            if not windows:
+                self.window = self.region = None
+                raise Exception(f"{self.title} window not found. Please open it and make sure it's visible.")
+            self.window = windows[0]
+        self.region = self._client_region(self.window)
+        self.located_at = time.monotonic()
+
+    def _client_region(self, win):
+        """Screen (left, top, width, height) of the window's client area, without title bar and borders."""
+        hwnd = getattr(win, "_hWnd", None)
+        if hwnd is not None and sys.platform == "win32":
+            import ctypes
+            from ctypes import wintypes
+            rect = wintypes.RECT()
+            origin = wintypes.POINT(0, 0)
+            ctypes.windll.user32.GetClientRect(hwnd, ctypes.byref(rect))
+            ctypes.windll.user32.ClientToScreen(hwnd, ctypes.byref(origin))
+            left, top, width, height = origin.x, origin.y, rect.right, rect.bottom
+        else:
+            left, top, width, height = win.left, win.top, win.width, win.height
+        if self.roi is not None:
+            x, y, w, h = self.roi
+            left, top = left + x, top + y
+            width, height = min(w, width - x), min(h, height - y)
+        return left, top, width, height
+
+    def grab(self):
+        if self.region is None or time.monotonic() - self.located_at > OCR_WINDOW_REFRESH:
+            self._locate()
+        try:
+            screenshot = self.pyautogui.screenshot(region=self.region)
+        except Exception:
+            # Moved, resized or closed since the last lookup
+            self._locate()
+            screenshot = self.pyautogui.screenshot(region=self.region)
+        # Single copy out of PIL, then RGB -> BGR in place
+        frame = np.array(screenshot)
+        cv2.cvtColor(frame, cv2.COLOR_RGB2BGR, dst=frame)
+        if self.debug_dump:
+            cv2.imwrite(self.dump_path, frame)
+            log.info("📸 Debug screenshot saved: %s", self.dump_path, extra={"rate_key": "capture.dump"})
+        return frame
+
+
+class FrameDiff:
+    """
+    Cheap change detection between consecutive frames: both are shrunk by
+    `scale` (bilinear; INTER_AREA costs more than thresholding the full frame),
+    converted to gray and absdiff'ed. Rows whose largest difference exceeds
+    `threshold` are dirty. The reference frame only advances on commit(), so a
+    band whose processing failed stays dirty until it goes through.
+    """
+
+    def __init__(self, scale=OCR_DIFF_SCALE, threshold=OCR_DIFF_THRESHOLD, margin=OCR_DIFF_MARGIN):
+        self.scale = scale
+        self.threshold = threshold
+        self.margin = margin  # in downsampled rows, so text straddling the band edge is kept
+        self.previous = None
+        self.shape = None
+        self.pending = None
+
+    def dirty_band(self, frame):
+        """(y0, y1) in frame rows spanning every change since the last committed frame, or None when nothing changed."""
+        h, w = frame.shape[:2]
+        small = cv2.resize(frame, (max(1, w // self.scale), max(1, h // self.scale)), interpolation=cv2.INTER_LINEAR)
+        if small.ndim == 3:
+            small = cv2.cvtColor(small, cv2.COLOR_BGR2GRAY)
+        self.pending = (small, frame.shape)
+        if self.previous is None or frame.shape != self.shape:
+            return 0, h
+        dirty = np.flatnonzero(cv2.reduce(cv2.absdiff(small, self.previous), 1, cv2.REDUCE_MAX).ravel() > self.threshold)
+        if not len(dirty):
+            return None
+        y0 = max(0, (dirty[0] - self.margin) * self.scale)
+        y1 = min(h, (dirty[-1] + 1 + self.margin) * self.scale)
+        return int(y0), int(y1)
+
+    def commit(self):
+        """Make the frame of the last dirty_band() call the reference, once its band has been processed."""
+        if self.pending is not None:
+            self.previous, self.shape = self.pending
+            self.pending = None
+
+
+class ReplaySource:
+    """
+    Replays saved screenshots (a directory of images or a single file) as frames,
+    for benchmarking and testing without a GUI. grab() returns None when exhausted.
+    """
+
+    IMAGE_PATTERNS = ("*.png", "*.jpg", "*.jpeg", "*.bmp")
+
+    def __init__(self, path, loop=False):
+        if os.path.isdir(path):
+            files = sorted(f for pattern in self.IMAGE_PATTERNS for f in glob.glob(os.path.join(path, pattern)))
+        else:
+            files = [path]
+        if not files:
+            raise FileNotFoundError(f"No screenshots found in {path}")
+        # Decode up front so replay timings measure the pipeline, not PNG decoding
+        self.frames = []
+        for f in files:
+            frame = cv2.imread(f)
+            if frame is None:
+                raise ValueError(f"Could not read image {f}")
+            self.frames.append(frame)
+        self.files = files
+        self.loop = loop
+        self.position = 0
+
+    def grab(self):
+        if self.position >= len(self.frames):
+            if not self.loop:
+                return None
+            self.position = 0
+        frame = self.frames[self.position]
+        self.position += 1
+        return frame
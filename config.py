@@ -3,14 +3,85 @@ TICK_PATH = "tick_size.xlsx"
 SD_CLEANED_PATH = "results_cleaned.xlsx"
 
 TICK_UPDATE_INTERVAL = 120  # seconds
+TICK_RESOLVE_CONCURRENCY = 8  # in-flight contract detail / market rule requests
+TICK_MAX_REQUESTS_PER_SEC = 40  # stays under TWS's 50 messages/second pacing limit
+TICK_LADDER_PATH = "tick_ladders.json"  # market rule id -> (lowEdge, increment) bands
 
 #ibkr
 IB_PORT = 7497
-IB_CLIENT_ID = 123
+# Client ids per connection role (ib_pool.py); orders are sharded by symbol over the "orders" ids
+IB_CLIENT_IDS = {"orders": [123, 124], "market_data": [125], "reference": [126]}
+IB_ACCOUNT = None  # account code to trade in when the login has several; None = the default account
+IB_CONNECT_ATTEMPTS = 5
+IB_RECONNECT_DELAY = 1.0  # seconds before the first retry, doubling per attempt
+IB_RECONNECT_MAX_DELAY = 60.0
+IB_ORDER_RETRY_ATTEMPTS = 5  # pipeline: tries per signal batch when placing its orders raises (waits as for reconnects)
 IB_HOST = "127.0.0.1"
 IB_DRY_RUN = True
+IB_SIMULATE = False  # True: trade against sim_broker.SimulatedIB instead of TWS / IB Gateway (nothing is sent)
 IB_USE_PAPER = True
 IB_MAX_ORDERS_PER_SIGNAL = 15
 IB_DEFAULT_WAIT_SD = 0.0
 IB_TRAILING_MODE = "OFF"
-IB_ONE_PERCENT_STOP = True
\ No newline at end of file
+IB_ONE_PERCENT_STOP = True
+IB_USE_ORDER_GROUPS = True  # send a signal's pyramid + trailing stop as one parent/child group
+IB_STREAM_TRAILING_STOPS = True  # amend trailing stops from live market data (market_data.py)
+MD_MAX_SYMBOLS = 500  # capacity of the streaming market data table
+
+#ocr
+OCR_ROW_CACHE_SIZE = 512  # max row strips remembered by the OCR row cache
+OCR_POLL_INTERVAL = 0.5  # seconds between screen captures
+OCR_ERROR_BACKOFF = 1.0  # seconds to wait after a failed capture/OCR cycle, doubling while it keeps failing
+OCR_MAX_ERROR_BACKOFF = 30.0
+OCR_WINDOW_REFRESH = 2.0  # seconds between re-reads of the window's position and size
+OCR_CAPTURE_ROI = None  # (x, y, w, h) of the table inside the window's client area; None = whole client area
+OCR_DIFF_SCALE = 4  # frame-diff downsampling factor
+OCR_DIFF_THRESHOLD = 16  # gray-level change that marks a downsampled row dirty
+OCR_DIFF_MARGIN = 2  # downsampled rows added around the dirty band
+OCR_DEBUG_DUMP = False  # also save every captured frame to table.png
+OCR_WORKERS = 4  # concurrent Tesseract processes per frame
+OCR_OMP_THREAD_LIMIT = 1  # OpenMP threads per Tesseract process (OCR_WORKERS x this <= cores)
+
+#signal store
+SIGNAL_STORE_BACKEND = "sqlite"  # "sqlite" or "csv"
+SIGNAL_DB_PATH = "signals.db"
+SIGNAL_CSV_DIR = "signals"
+SIGNAL_LEDGER_PATH = "ledger.db"  # watermark + processed-signal ledger for ibkr.process_signals
+SIGNAL_LEDGER_PENDING_TIMEOUT = 300  # seconds; older 'pending' claims (a crash mid-placement) are marked failed at startup
+
+#benchmark
+BENCH_BASELINE_PATH = "benchmark_baseline.json"
+BENCH_REGRESSION_THRESHOLD = 0.25  # fail when a stage's p50 is more than 25% slower
+BENCH_MIN_REGRESSION_MS = 1.0  # ...and more than this much slower (sub-ms stages are timer noise)
+
+#metrics
+METRICS_ENABLED = True
+METRICS_EXPORT = "jsonl"  # "prometheus" (HTTP /metrics), "jsonl" or "off"
+METRICS_PORT = 9108
+METRICS_JSONL_PATH = "metrics.jsonl"
+METRICS_JSONL_MAX_BYTES = 10 * 2**20
+METRICS_JSONL_BACKUPS = 5
+METRICS_FLUSH_INTERVAL = 60  # seconds between histogram snapshots in the JSONL file
+METRICS_TRACE_MAX_KEYS = 10000  # open signal-to-wire traces kept before the oldest is dropped
+
+#logging
+LOG_LEVEL = "INFO"  # "DEBUG" adds sampled per-frame OCR dumps
+LOG_CONSOLE_LEVEL = "INFO"
+LOG_FILE = "trading.log"
+LOG_FILE_MAX_BYTES = 20 * 2**20
+LOG_FILE_BACKUPS = 5
+LOG_JSON = True  # structured JSON lines in LOG_FILE (console stays plain text)
+LOG_DEBUG_SAMPLE_EVERY = 20  # keep every n-th DEBUG record per call site
+LOG_RATE_LIMIT_INTERVAL = 30  # seconds between records sharing a rate_key
+
+#sizing
+SIZING_DEFAULT_NET_LIQUIDATION = 100000  # until IB reports NetLiquidation (and for offline sizing)
+SIZING_CAPITAL_USAGE = 0.80  # share of net liquidation x leverage stock sizes are computed from
+SIZING_MAX_SYMBOL_FRACTION = 0.5  # one symbol's notional <= this x net liquidation x its leverage
+SIZING_MAX_GROSS_LEVERAGE = float("inf")  # gross notional of the account <= this x net liquidation (inf: no cap)
+
+#dedup
+DEDUP_DB_PATH = "dedup.db"
+DEDUP_WINDOW_SECONDS = 7 * 24 * 3600  # forget signal fingerprints older than this
+DEDUP_MEMORY_KEYS = 4096  # recent fingerprints answered without touching SQLite
+DEDUP_EXPIRE_INTERVAL = 3600  # seconds between expiry sweeps
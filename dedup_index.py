@@ -0,0 +1,170 @@
+import hashlib
+import re
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+from config import DEDUP_DB_PATH, DEDUP_EXPIRE_INTERVAL, DEDUP_MEMORY_KEYS, DEDUP_WINDOW_SECONDS
+from row_parser import DATETIME_CONFUSIONS, SYMBOL_CONFUSIONS
+
+_NON_DIGIT = re.compile(r"\D")
+_NON_ALPHA = re.compile(r"[^A-Z]")
+
+
+def _digest(text):
+    """Signed 64-bit blake2b of text, so it fits an SQLite INTEGER key."""
+    return int.from_bytes(hashlib.blake2b(text.encode(), digest_size=8).digest(), "big", signed=True)
+
+def fingerprint(date, time_, symbol):
+    """
+    Fixed-width key of a signal's (date, time, symbol), normalized so OCR jitter
+    in those fields (letter/digit confusions, separators, seconds past 59,
+    'EURUSD' vs 'EUR.USD') maps to the same key. Prices are not part of the key.
+    """
+    date = _NON_DIGIT.sub("", str(date).translate(DATETIME_CONFUSIONS))
+    digits = _NON_DIGIT.sub("", str(time_).translate(DATETIME_CONFUSIONS))
+    if len(digits) == 6 and int(digits[4:]) > 59:
+        digits = digits[:4] + "59"
+    symbol = _NON_ALPHA.sub("", str(symbol).upper().translate(SYMBOL_CONFUSIONS))
+    return _digest(f"{date}|{digits}|{symbol}")
+
+def fingerprint_text(cells):
+    """Fallback key for rows that do not parse into signal fields: the exact cell text."""
+    return _digest("\x1f".join(str(c) for c in cells))
+
+
+class DedupIndex:
+    """
+    Fingerprints of the signal rows seen so far, in SQLite (one 8-byte key per row).
+    Opening it reads nothing, lookups hit a small in-memory LRU first, and keys
+    whose signal is older than `window` seconds are deleted, so both memory and
+    disk stay bounded however long the history gets.
+
+    A key is claimed when its row is detected and only written to SQLite by
+    record() once the row is persisted; until then it is pending in memory, so
+    later frames skip the row, and release() hands it back if persisting fails.
+    """
+
+    def __init__(self, path=DEDUP_DB_PATH, window=DEDUP_WINDOW_SECONDS, memory_keys=DEDUP_MEMORY_KEYS):
+        self.window = window
+        self.memory_keys = memory_keys
+        self.recent = OrderedDict()
+        self.pending = set()
+        self.hits = 0
+        self.misses = 0
+        self.last_expire = 0.0
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.execute("CREATE TABLE IF NOT EXISTS seen (fp INTEGER PRIMARY KEY, seen_at INTEGER) WITHOUT ROWID")
+        self.conn.execute("CREATE INDEX IF NOT EXISTS seen_at ON seen (seen_at)")
+        self.conn.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT)")
+        self.conn.commit()
+
+    def _remember(self, fp):
+        self.recent[fp] = None
+        self.recent.move_to_end(fp)
+        if len(self.recent) > self.memory_keys:
+            self.recent.popitem(last=False)
+
+    def claim(self, fps, seen_at=None):
+        """
+        Returns one flag per input, True where the fingerprint was neither recorded
+        nor pending (the first of any duplicates within fps counts as new); the new
+        ones are held as pending until record() or release(). With seen_at (epoch
+        second of each row's signal), signals older than the window are never new:
+        their keys are not kept, so they could not be told apart from new ones.
+        """
+        fps = list(fps)
+        if seen_at is not None:
+            cutoff = int(time.time() - self.window)
+            stale = {fp for fp, t in zip(fps, seen_at) if t < cutoff}
+        else:
+            stale = set()
+        with self.lock:
+            unknown = {fp for fp in fps if fp not in self.recent and fp not in self.pending and fp not in stale}
+            known = set()
+            if unknown:
+                params = list(unknown)
+                for i in range(0, len(params), 500):
+                    chunk = params[i:i + 500]
+                    cur = self.conn.execute(
+                        f"SELECT fp FROM seen WHERE fp IN ({', '.join('?' * len(chunk))})", chunk
+                    )
+                    known.update(fp for (fp,) in cur)
+
+            flags = []
+            claimed = set()
+            for fp in fps:
+                new = fp in unknown and fp not in known and fp not in claimed
+                if new:
+                    claimed.add(fp)
+                elif fp in known or fp in self.recent:
+                    self._remember(fp)
+                flags.append(new)
+            self.pending |= claimed
+            self.misses += len(claimed)
+            self.hits += len(fps) - len(claimed)
+        return flags
+
+    def record(self, fps, seen_at):
+        """
+        Write fingerprints of persisted rows; seen_at is the epoch second of each
+        row's signal, which is what expiry goes by.
+        """
+        rows = list(zip(fps, (int(t) for t in seen_at)))
+        # Signals already outside the window would only be deleted by the next expiry
+        cutoff = int(time.time() - self.window)
+        with self.lock:
+            with self.conn:
+                self.conn.executemany(
+                    "INSERT OR IGNORE INTO seen (fp, seen_at) VALUES (?, ?)", [r for r in rows if r[1] >= cutoff]
+                )
+            for fp, _ in rows:
+                self.pending.discard(fp)
+                self._remember(fp)
+        self.expire()
+
+    def release(self, fps):
+        """Drop pending fingerprints whose rows were not persisted, so they count as new again."""
+        with self.lock:
+            self.pending.difference_update(fps)
+
+    def expire(self, force=False):
+        """Delete keys of signals older than the window (at most once per DEDUP_EXPIRE_INTERVAL unless forced)."""
+        now = time.time()
+        if not force and now - self.last_expire < DEDUP_EXPIRE_INTERVAL:
+            return 0
+        self.last_expire = now
+        with self.lock, self.conn:
+            return self.conn.execute("DELETE FROM seen WHERE seen_at < ?", (int(now - self.window),)).rowcount
+
+    def migrated(self):
+        """True once the stored history has been recorded (see mark_migrated)."""
+        with self.lock:
+            return self.conn.execute("SELECT 1 FROM meta WHERE key = 'migrated'").fetchone() is not None
+
+    def mark_migrated(self):
+        with self.lock, self.conn:
+            self.conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('migrated', ?)", (str(int(time.time())),))
+
+    def is_empty(self):
+        with self.lock:
+            return self.conn.execute("SELECT 1 FROM seen LIMIT 1").fetchone() is None
+
+    def stats(self):
+        return {"hits": self.hits, "new": self.misses, "pending": len(self.pending), "memory_keys": len(self.recent)}
+
+    def close(self):
+        self.conn.close()
+
+
+_index = None
+
+def get_dedup_index():
+    global _index
+    if _index is None:
+        _index = DedupIndex()
+    return _index
@@ -0,0 +1,209 @@
+"""
+Pool of IB API connections, one client id each, split by traffic:
+
+    reference    contract details and market rules (tick.py)
+    market_data  quotes and positions (market_data.TrailingStopManager)
+    orders       order entry, sharded by symbol over every client id listed
+
+A symbol always maps to the same order connection, so its orders, order
+groups and trailing-stop amendments stay on the client id that owns them,
+while different symbols spread over several sockets (and pacing budgets).
+Roles listed with the same client id share one connection; IBPool.wrap(ib)
+puts every role on a single existing connection, e.g. a SimulatedIB.
+Dropped connections reconnect with exponential backoff.
+"""
+import asyncio
+import logging
+import time
+import weakref
+import zlib
+
+from ib_insync import IB, util
+
+from config import (
+    IB_ACCOUNT, IB_CLIENT_IDS, IB_CONNECT_ATTEMPTS, IB_HOST, IB_PORT, IB_RECONNECT_DELAY, IB_RECONNECT_MAX_DELAY,
+)
+from order import submit_orders
+
+log = logging.getLogger(__name__)
+
+ROLES = ("reference", "market_data", "orders")
+
+
+def backoff_delays(attempts=IB_CONNECT_ATTEMPTS, first=IB_RECONNECT_DELAY, longest=IB_RECONNECT_MAX_DELAY):
+    """Waits between connection attempts: first, 2x first, ... capped at longest (attempts - 1 of them)."""
+    return [min(longest, first * 2 ** i) for i in range(attempts - 1)]
+
+
+class PooledConnection:
+    """One IB client id; reconnects by itself when the socket drops (unless managed=False)."""
+
+    def __init__(self, client_id, ib, host=IB_HOST, port=IB_PORT, account=IB_ACCOUNT, managed=True):
+        self.client_id = client_id
+        self.ib = ib
+        self.host = host
+        self.port = port
+        self.account = account
+        self.managed = managed
+        self.closing = False
+        self.reconnecting = False
+        if managed and hasattr(ib, "disconnectedEvent"):
+            ib.disconnectedEvent += self.on_disconnected
+
+    def _connect_args(self):
+        return dict(clientId=self.client_id, account=self.account or "")
+
+    def connect(self):
+        for delay in backoff_delays() + [None]:
+            try:
+                self.ib.connect(self.host, self.port, **self._connect_args())
+                log.info("✅ Connected to IBKR (client %s)", self.client_id)
+                return self.ib
+            except (OSError, asyncio.TimeoutError) as e:
+                if delay is None:
+                    raise
+                log.warning("⚠️ Client %s connect failed (%s), retrying in %.0fs", self.client_id, e, delay)
+                time.sleep(delay)
+
+    async def connect_async(self):
+        for delay in backoff_delays() + [None]:
+            try:
+                await self.ib.connectAsync(self.host, self.port, **self._connect_args())
+                log.info("✅ Connected to IBKR (client %s)", self.client_id)
+                return self.ib
+            except (OSError, asyncio.TimeoutError) as e:
+                if delay is None:
+                    raise
+                log.warning("⚠️ Client %s connect failed (%s), retrying in %.0fs", self.client_id, e, delay)
+                await asyncio.sleep(delay)
+
+    def ensure(self):
+        """The connected IB, reconnecting first if the socket dropped."""
+        if self.managed and not self.ib.isConnected():
+            self.connect()
+        return self.ib
+
+    def on_disconnected(self):
+        if self.closing or self.reconnecting:
+            return
+        log.warning("🔌 Client %s disconnected", self.client_id)
+        loop = util.getLoop()
+        if loop.is_running():
+            # Inside ib.sleep / the asyncio pipeline: reconnect in the background.
+            # Otherwise the next ensure() reconnects.
+            loop.create_task(self._reconnect())
+
+    async def _reconnect(self):
+        self.reconnecting = True
+        try:
+            delay = IB_RECONNECT_DELAY
+            while not self.closing and not self.ib.isConnected():
+                await asyncio.sleep(delay)
+                try:
+                    await self.ib.connectAsync(self.host, self.port, **self._connect_args())
+                    log.info("🔁 Client %s reconnected", self.client_id)
+                except (OSError, asyncio.TimeoutError) as e:
+                    log.warning("⚠️ Client %s reconnect failed (%s)", self.client_id, e)
+                    delay = min(IB_RECONNECT_MAX_DELAY, delay * 2)
+        finally:
+            self.reconnecting = False
+
+    def disconnect(self):
+        self.closing = True
+        self.ib.disconnect()
+
+
+class IBPool:
+    """
+    Connections by role. client_ids maps each role to a list of client ids;
+    factory builds the IB object for a client id (IB, or a fake such as
+    sim_broker.SimulatedIB for testing).
+    """
+
+    def __init__(self, client_ids=IB_CLIENT_IDS, host=IB_HOST, port=IB_PORT, account=IB_ACCOUNT, factory=IB):
+        self.account = account
+        self.connections = {}  # client id -> PooledConnection
+        self.roles = {}
+        for role in ROLES:
+            ids = client_ids.get(role) or client_ids["orders"]
+            self.roles[role] = [self._connection(cid, host, port, account, factory) for cid in ids]
+
+    def _connection(self, client_id, host, port, account, factory):
+        if client_id not in self.connections:
+            self.connections[client_id] = PooledConnection(client_id, factory(), host, port, account)
+        return self.connections[client_id]
+
+    @classmethod
+    def wrap(cls, ib):
+        """A pool with every role on one existing connection, which the caller connects and owns."""
+        pool = cls.__new__(cls)
+        pool.account = None
+        connection = PooledConnection(None, ib, managed=False)
+        pool.connections = {None: connection}
+        pool.roles = {role: [connection] for role in ROLES}
+        return pool
+
+    def _role_connections(self, roles):
+        return list({id(c): c for role in roles for c in self.roles[role]}.values())
+
+    def connect(self, roles=ROLES):
+        """Connect the connections serving roles (a process only opens the client ids it uses)."""
+        for connection in self._role_connections(roles):
+            if not connection.ib.isConnected():
+                connection.connect()
+        return self
+
+    async def connect_async(self, roles=ROLES):
+        await asyncio.gather(*(c.connect_async() for c in self._role_connections(roles) if not c.ib.isConnected()))
+        return self
+
+    def disconnect(self):
+        for connection in self.connections.values():
+            if connection.ib.isConnected():
+                connection.disconnect()
+
+    def sleep(self, seconds):
+        """Wait while processing events; every connection shares ib_insync's event loop."""
+        next(iter(self.connections.values())).ib.sleep(seconds)
+
+    def reference(self):
+        return self.roles["reference"][0].ensure()
+
+    def market_data(self):
+        return self.roles["market_data"][0].ensure()
+
+    def _shard(self, symbol):
+        orders = self.roles["orders"]
+        return orders[zlib.crc32(symbol.encode()) % len(orders)] if len(orders) > 1 else orders[0]
+
+    def for_symbol(self, symbol):
+        """The order connection that owns symbol's orders."""
+        return self._shard(symbol).ensure()
+
+    def order_ibs(self):
+        return [c.ib for c in self.roles["orders"]]
+
+    def submit_orders(self, requests):
+        """order.submit_orders per shard; returns the trades in request order."""
+        requests = list(requests)
+        shards = {}  # connection -> request positions
+        for i, (symbol, _, order) in enumerate(requests):
+            if self.account and not order.account:
+                order.account = self.account
+            shards.setdefault(self._shard(symbol), []).append(i)
+        trades = [None] * len(requests)
+        for connection, positions in shards.items():
+            for i, trade in zip(positions, submit_orders(connection.ensure(), [requests[i] for i in positions])):
+                trades[i] = trade
+        return trades
+
+
+_wrapped = weakref.WeakKeyDictionary()
+
+def as_pool(ib):
+    """ib if it is already an IBPool, else a single-connection pool around it (one per ib)."""
+    if isinstance(ib, IBPool):
+        return ib
+    if ib not in _wrapped:
+        _wrapped[ib] = IBPool.wrap(ib)
+    return _wrapped[ib]
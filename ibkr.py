@@ -1,41 +1,55 @@
+import numpy as np
 import pandas as pd
 from config import *
 import math
 from datetime import datetime
-from order import place_limit_order, cancel_all_orders_for_symbol, place_trailing_stop
+from order import (
+    cancel_all_orders_for_symbol, cancel_symbol_groups, pyramid_requests, register_group,
+    signal_group_requests, trailing_stop_order,
+)
+from log_setup import setup_logging
+from metrics import start_export, timer, trace_finish, trace_mark
+from ib_pool import IBPool, as_pool
+from order_book import get_order_book
+from signal_store import get_signal_ledger, get_signal_store
+from sizing import get_account_state, size_batch
+from symbol_ref import get_symbol_cache
+from tick_ladder import get_tick_ladders
 from ib_insync import *
 import logging
-from pathlib import Path
-import time
 
 xlsx_path = XLSX_PATH
 tick_path = TICK_PATH
 
-logging.basicConfig(
-    filename="trading.log",
-    level=logging.INFO,
-    format="%(asctime)s [%(levelname)s] %(message)s"
-)
+log = logging.getLogger(__name__)
 
 def connect_ibkr():
-    ib = IB()
-    ib.connect(IB_HOST, IB_PORT, clientId=IB_CLIENT_ID)
+    if IB_SIMULATE:
+        from sim_broker import SimulatedIB
+        log.warning("🧪 IB_SIMULATE is on: orders go to the simulated broker, NOT to TWS / IB Gateway")
+        return IBPool.wrap(SimulatedIB().connect())
+    pool = IBPool().connect(("market_data", "orders"))
     print("✅ Connected to IBKR")
-    return ib
+    return pool
+
+def signal_keys(df: pd.DataFrame) -> pd.Series:
+    return df["SignalDate"].astype(str) + "_" + df["SignalTime"].astype(str) + "_" + df["Symbol"]
 
-def clean_signals() -> pd.DataFrame:
-    df = pd.read_excel(xlsx_path)
+def clean_signals(df: pd.DataFrame = None) -> pd.DataFrame:
+    if df is None:
+        df = get_signal_store().read_signals().drop(columns=["SignalId"])
     # Step 2a: Remove duplicates (SignalDate + SignalTime + Symbol as unique key)
-    df["UniqueKey"] = df["SignalDate"].astype(str) + "_" + df["SignalTime"].astype(str) + "_" + df["Symbol"]
+    df["UniqueKey"] = signal_keys(df)
     df = df.drop_duplicates(subset=["UniqueKey"], keep="last")
 
-    # Step 2b: Remove rows with BidPrice or AskPrice = 0
-    df = df[(df["BidPrice"] != 0) & (df["AskPrice"] != 0)]
-    # Step 2c: Convert numeric columns safely
+    # Step 2b: Convert numeric columns safely (the store keeps OCR text as-is)
     numeric_cols = ["BidPrice", "AskPrice", "LastPrice", "EqPrice", "EqLevel", "Bias"]
     for col in numeric_cols:
         df[col] = pd.to_numeric(df[col], errors="coerce")
 
+    # Step 2c: Remove rows with BidPrice or AskPrice = 0
+    df = df[(df["BidPrice"] != 0) & (df["AskPrice"] != 0)]
+
     # Drop rows where any critical numeric value is missing
     df = df.dropna(subset=numeric_cols)
 
@@ -49,21 +63,21 @@ def load_symbol_config():
     Symbol | AssetType | WaitDevs | MaxOrders | PercentCapital | FixedShares | FixedForexUSD
     AAPL   | equity    | 1        | 15        | 0.02           | 50          | 
     EURUSD | forex     | 1        | 10        | 0.02           |             | 100000
+    Served from the shared symbol cache; the sheet is only re-read when it changes.
     """
-    df = pd.read_excel(TICK_PATH, sheet_name="Sheet1")
-    df = df.set_index("Symbol").to_dict(orient="index")
-    return df
+    return get_symbol_cache().config()
 
-def calculate_position_size(symbol, config, portfolio_value, leverage):
+def calculate_position_size(symbol, config, portfolio_value, leverage, last_price):
+    """Unlimited size of one signal; sizing.size_batch is the batch version that also applies limits."""
     settings = config.get(symbol, {})
     asset_type = settings.get("Type", "Stock")
 
     if asset_type == "Stock":
         # Portfolio × leverage × 80% × PercentCapital
         percent_capital = settings.get("PercentCapital", 0.02)  # default 2%
-        capital_available = portfolio_value * leverage * 0.80
+        capital_available = portfolio_value * leverage * SIZING_CAPITAL_USAGE
         entry_value = capital_available * percent_capital
-        return math.floor(entry_value / settings.get("LastPrice", 1))
+        return math.floor(entry_value / last_price)
 
     elif asset_type == "Forex":
         # For testing, use fixed USD amount (e.g., $100k)
@@ -146,114 +160,265 @@ def calc_stop_loss(row):
     if sl_bps is not None:
         return f"TRAIL_SL_{sl_bps}"
 
-def result_with_sd(df: pd.DataFrame) -> pd.DataFrame:
-    tick_sizes = pd.read_excel(tick_path, sheet_name="Sheet1").set_index("Symbol")["QuoteTick"].to_dict()
+def stop_loss_progression_vec(profit_bps):
+    """
+    Vectorized stop_loss_progression. The scalar loop assigns the lowest matching
+    band last, so every profit below 35 bps trails at 2 bps; NaN stays NaN.
+    """
+    profit_bps = np.asarray(profit_bps, dtype=float)
+    above = 35 + 10 * np.trunc((profit_bps - 35) / 10) - 10
+    return np.where(profit_bps < 35, 2, above)
+
+def compute_sd_vec(eq_price, last_price, eq_level, tick_size):
+    """Vectorized compute_sd / compute_sd_tick. Returns (SD, SD in ticks)."""
+    with np.errstate(divide="ignore", invalid="ignore"):
+        raw_sd = np.abs(eq_price - last_price) / np.abs(eq_level)
+        ticks = np.ceil(raw_sd / tick_size)
+    zero = eq_level == 0
+    sd = np.where(zero, 0.0, ticks * tick_size)
+    sd_tick = np.where(zero, 0, ticks)
+    return sd, sd_tick
+
+def pyramid_ladder(entry, sd, wait_devs, max_orders, is_long):
+    """
+    Vectorized generate_pyramid_orders as a (rows x max MaxOrders) price array.
+    Entries past a row's MaxOrders (or for rows without a ladder) are NaN.
+    """
+    width = int(np.nanmax(max_orders)) if len(max_orders) else 0
+    steps = np.arange(width)
+    deviation = (wait_devs[:, None] + steps[None, :]) * sd[:, None]
+    prices = np.where(is_long[:, None], entry[:, None] + deviation, entry[:, None] - deviation)
+    valid = (steps[None, :] < max_orders[:, None]) & (~np.isnan(entry) & (sd > 0))[:, None]
+    return np.where(valid, np.round(prices, 5), np.nan)
+
+def config_column(symbols: pd.Series, config: pd.DataFrame, column, default) -> pd.Series:
+    """symbol_config.get(s, {}).get(column, default) for a whole column of symbols."""
+    if column not in config.columns:
+        return pd.Series(default, index=symbols.index)
+    return symbols.map(config[column]).where(symbols.isin(config.index), default)
+
+def compute_signal_columns(df: pd.DataFrame, tick_sizes: dict, symbol_config,
+                           account=None, tick_ladders=None) -> pd.DataFrame:
+    """
+    SD, sizing, entry, pyramid and stop-loss columns for a batch of signals in one pass.
+    symbol_config is the sheet indexed by Symbol (SymbolReferenceCache.config_frame)
+    or the same as a {symbol: {column: value}} dict.
+    Sizes come from sizing.size_batch against account (an AccountSnapshot; the
+    default one without positions when None). With a TickLadderIndex, pyramid
+    prices are snapped to the valid tick of their market rule's price band;
+    symbols without a known rule keep round(price, 5).
+    """
+    df = df.copy()
     df["TickSize"] = df["Symbol"].map(tick_sizes).fillna(0.0001)
-    df["SD"] = df.apply(lambda row: compute_sd(row["EqPrice"], row["LastPrice"], row["EqLevel"], row["TickSize"]), axis=1)
-    df["SD_tick"] = df.apply(lambda row: compute_sd_tick(row["EqPrice"], row["LastPrice"], row["EqLevel"], row["TickSize"]), axis=1)
-    df = df[df["SD"] > 0]
+    sd, sd_tick = compute_sd_vec(
+        df["EqPrice"].to_numpy(float), df["LastPrice"].to_numpy(float),
+        df["EqLevel"].to_numpy(float), df["TickSize"].to_numpy(float),
+    )
+    df["SD"] = sd
+    df["SD_tick"] = sd_tick.astype(np.int64)
+    df = df[df["SD"] > 0].copy()
 
     # ---- Step 4: Trade validation ----
     # Custom wait deviations (for now fixed, later from table)
-    symbol_config = load_symbol_config()
-    df["WaitDevs"] = df["Symbol"].apply(lambda s: symbol_config.get(s, {}).get("WaitDevs", 1))
-    df["MaxOrders"] = df["Symbol"].apply(lambda s: symbol_config.get(s, {}).get("MaxOrders", 5))
-    df["PositionSize"] = df.apply(
-        lambda row: calculate_position_size(
-            row["Symbol"], symbol_config,
-            portfolio_value=100000,  # testing value
-            leverage=3 if symbol_config.get(row["Symbol"], {}).get("Type") == "Stock" else 30
-        ),
-        axis=1
-    )
-
-    df["EntryPrice"] = df.apply(lambda row: get_entry_price(row["Signal"], row["BidPrice"], row["AskPrice"]), axis=1)
+    config = symbol_config
+    if not isinstance(config, pd.DataFrame):
+        config = pd.DataFrame.from_dict(config, orient="index")
+    symbols = df["Symbol"]
+    df["WaitDevs"] = config_column(symbols, config, "WaitDevs", 1)
+    df["MaxOrders"] = config_column(symbols, config, "MaxOrders", 5)
+
+    signal = df["Signal"].to_numpy()
+    is_long = signal == "LongTrigger"
+    entry = np.where(is_long, df["BidPrice"].to_numpy(float),
+                     np.where(signal == "ShortTrigger", df["AskPrice"].to_numpy(float), np.nan))
+    df["EntryPrice"] = entry
     df["LastUpdated"] = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-    df["PyramidOrders"] = df.apply(lambda row: generate_pyramid_orders(row), axis=1)
 
-    df["StopLossAction"] = df.apply(lambda row: calc_stop_loss(row), axis=1)
+    ladder = pyramid_ladder(
+        entry, df["SD"].to_numpy(float), df["WaitDevs"].to_numpy(float),
+        df["MaxOrders"].to_numpy(float), is_long,
+    )
+    if tick_ladders is not None:
+        rule_ids = config_column(symbols, config, "MarketRuleId", np.nan).to_numpy(float)
+        ladder = tick_ladders.snap(rule_ids, ladder)
+    counts = (~np.isnan(ladder)).sum(axis=1)
+    df["PyramidOrders"] = [prices[:n].tolist() for prices, n in zip(ladder, counts)]
+
+    # Sizing: unknown symbols size as Stock but get the non-Stock leverage; the sheet's Leverage wins
+    asset_type = config_column(symbols, config, "Type", "Stock").to_numpy(object)
+    default_leverage = np.where(config_column(symbols, config, "Type", None) == "Stock", 3, 30)
+    leverage = config_column(symbols, config, "Leverage", np.nan).fillna(pd.Series(default_leverage, index=symbols.index))
+    size = size_batch(
+        symbols, asset_type, leverage.to_numpy(float),
+        config_column(symbols, config, "PercentCapital", 0.02).to_numpy(float),
+        config_column(symbols, config, "FixedForexUSD", 100000).to_numpy(float),
+        df["LastPrice"].to_numpy(float), counts, account,
+    )
+    df.insert(df.columns.get_loc("EntryPrice"), "PositionSize", size.astype(np.int64))
+
+    # calc_stop_loss
+    last = df["LastPrice"].to_numpy(float)
+    profit_bps = np.where(is_long, (last - entry) / entry, (entry - last) / entry) * 10000
+    sl_bps = stop_loss_progression_vec(profit_bps)
+    trail = np.char.add("TRAIL_SL_", np.nan_to_num(sl_bps).astype(np.int64).astype(str))
+    exit_1pct = profit_bps <= -1 * 100  # 1% account value hard stop
+    df["StopLossAction"] = np.where(exit_1pct, "EXIT_1PCT", trail).astype(object)
+    df.loc[np.isnan(profit_bps), "StopLossAction"] = None  # unknown Signal or missing price: no stop
 
     # Mark cancel conditions (exit reached)
-    df["CancelRemainingOrders"] = df["StopLossAction"].apply(lambda x: True if x and x.startswith("EXIT") else False)
+    df["CancelRemainingOrders"] = exit_1pct
     return df
 
+def result_with_sd(df: pd.DataFrame, account=None) -> pd.DataFrame:
+    cache = get_symbol_cache()
+    return compute_signal_columns(df, cache.quote_ticks(), cache.config_frame(), account, tick_ladders=get_tick_ladders())
+
 def main():
+    setup_logging()
     ib = connect_ibkr()
-    df = clean_signals()
-    sd_df = result_with_sd(df)
-    symbol_config = load_symbol_config()
-    sd_df.to_excel(SD_CLEANED_PATH, index=False)
-    for _, row in sd_df.iterrows():
-        symbol = row["Symbol"]
-        settings = symbol_config.get(symbol, {})
-        asset_type = settings.get("Type", "Stock")
-        qty = row["PositionSize"]
-
-        # Place pyramid limit orders
-        for price in row["PyramidOrders"]:
-            action = "BUY" if row["Signal"] == "LongTrigger" else "SELL"
-            place_limit_order(ib, symbol, asset_type, qty, price, action)
-
-        # Stop loss handling
-        if row["StopLossAction"] and row["StopLossAction"].startswith("TRAIL_SL"):
-            trail_amount = float(row["StopLossAction"].replace("TRAIL_SL_", "").replace("bps", "")) / 10000
-            place_trailing_stop(ib, symbol, asset_type, qty, trail_amount, action)
-        elif row["StopLossAction"] == "EXIT_1PCT":
-            cancel_all_orders_for_symbol(ib, symbol)
-
+    process_signals(ib)
     ib.sleep(2)  # allow orders to be sent
     ib.disconnect()
-    print(sd_df)
 
-def process_signals(ib, portfolio_value=100000):
+def process_signals(ib):
     """
     Core signal processing for one iteration.
-    Loads signals, calculates SD, places/cancels orders.
+    Reads only signals newer than the persisted watermark, calculates SD,
+    sizes them against the live account and places/cancels orders once per
+    signal (see SignalLedger).
     """
     try:
-        if not Path(xlsx_path).exists():
-            logging.warning("⚠️ Signal file not found")
+        ledger = get_signal_ledger()
+        with timer("ibkr.read_signals"):
+            raw = get_signal_store().read_signals(after_id=ledger.watermark())
+        if raw.empty:
+            log.info("No new signals in signal store", extra={"rate_key": "ibkr.no_signals"})
             return
+        high_water = int(raw["SignalId"].max())
 
-        df = clean_signals()
-        if df.empty:
-            logging.info("No signals found in Excel")
-            return
+        sd_df, processed = handle_signals(ib, raw)
+        if not sd_df.empty:
+            with timer("ibkr.write_cleaned"):
+                sd_df.to_excel(SD_CLEANED_PATH, index=False)
+
+        ledger.set_watermark(high_water)
+        log.info("✅ Processed %d new signals (watermark %d, symbol cache %s)", processed, high_water,
+                 get_symbol_cache().stats(), extra={"processed": processed, "watermark": high_water})
+        log.info("📒 Order book: %s", get_order_book(ib).snapshot())
 
-        sd_df = result_with_sd(df)
-        symbol_config = load_symbol_config()
-        sd_df.to_excel(SD_CLEANED_PATH, index=False)
+    except Exception as e:
+        log.error("❌ Error in process_signals: %s", e, exc_info=True)
+
+def account_snapshot(ib):
+    """Sizing snapshot of the account behind ib (an IB or IBPool), with its working orders."""
+    pool = as_pool(ib)
+    return get_account_state(pool.market_data()).snapshot(get_order_book(pool))
+
+def prepare_signals(raw: pd.DataFrame, account=None) -> pd.DataFrame:
+    """Clean a batch of raw signal rows and compute its order columns. No broker calls, so it can run in a worker thread."""
+    with timer("ibkr.clean_signals"):
+        df = clean_signals(raw)
+    if df.empty:
+        return df
+    with timer("ibkr.result_with_sd"):
+        return result_with_sd(df, account)
+
+def handle_signals(ib, raw: pd.DataFrame):
+    """
+    Clean, size and place orders for a batch of raw signal rows (store or OCR columns).
+    Returns the computed frame and the number of signals that led to orders.
+    """
+    sd_df = prepare_signals(raw, account_snapshot(ib))
+    if sd_df.empty:
+        return sd_df, 0
+    return sd_df, place_signals(ib, sd_df)
 
-        for _, row in sd_df.iterrows():
+def place_signals(ib, sd_df: pd.DataFrame):
+    """
+    Place/cancel the orders of a prepared batch (see prepare_signals).
+    Each UniqueKey is claimed in the ledger first, so a signal is acted on once.
+    ib may be an IBPool; a symbol's orders then go through its order connection.
+    Returns the number of signals claimed.
+    """
+    ledger = get_signal_ledger()
+    pool = as_pool(ib)
+    book = get_order_book(pool)
+    symbol_config = load_symbol_config()
+
+    requests = []
+    groups = []
+    claimed = []
+    try:
+        for key, (_, row) in zip(signal_keys(sd_df), sd_df.iterrows()):
+            signal_id = row.get("SignalId")
+            if not ledger.claim(key, None if pd.isna(signal_id) else int(signal_id)):
+                continue
+            claimed.append(key)
+            trace_mark(key, "claimed")
             symbol = row["Symbol"]
             settings = symbol_config.get(symbol, {})
             asset_type = settings.get("Type", "Stock")
             qty = row["PositionSize"]
+            action = "BUY" if row["Signal"] == "LongTrigger" else "SELL"
+
+            # --- Exit: cancel everything for the symbol, no new entries ---
+            if row["StopLossAction"] == "EXIT_1PCT":
+                if not cancel_symbol_groups(pool.for_symbol(symbol), symbol):
+                    cancel_all_orders_for_symbol(pool.for_symbol(symbol), symbol, book)
+                continue
+            if qty <= 0:
+                log.info("📏 %s sized to 0 (per-symbol or gross limit reached), no new orders", symbol,
+                         extra={"symbol": symbol, "rate_key": f"ibkr.size_limit.{symbol}"})
+                continue
 
-            # --- Place pyramid limit orders ---
-            for price in row["PyramidOrders"]:
-                action = "BUY" if row["Signal"] == "LongTrigger" else "SELL"
-                place_limit_order(ib, symbol, asset_type, qty, price, action)
+            # --- Skip pyramid levels already working at the same price ---
+            prices = [p for p in row["PyramidOrders"] if not book.has_working_order(symbol, action, p)]
 
-            # --- Stop loss handling ---
+            trail_amount = None
             if row["StopLossAction"] and row["StopLossAction"].startswith("TRAIL_SL"):
                 trail_amount = float(row["StopLossAction"].replace("TRAIL_SL_", "").replace("bps", "")) / 10000
-                place_trailing_stop(ib, symbol, asset_type, qty, trail_amount, action)
-            elif row["StopLossAction"] == "EXIT_1PCT":
-                cancel_all_orders_for_symbol(ib, symbol)
 
-        logging.info(f"✅ Processed {len(sd_df)} signals")
-
-    except Exception as e:
-        logging.error(f"❌ Error in process_signals: {e}", exc_info=True)
+            if IB_USE_ORDER_GROUPS:
+                # --- Pyramid + trailing stop as one linked group ---
+                group, group_requests = signal_group_requests(
+                    pool.for_symbol(symbol), symbol, asset_type, qty, prices, action, trail_amount
+                )
+                if group is not None:
+                    groups.append((group, len(requests), len(requests) + len(group_requests)))
+                    requests += group_requests
+            else:
+                # --- Independent pyramid limit orders and trailing stop ---
+                requests += pyramid_requests(symbol, asset_type, qty, prices, action)
+                if trail_amount is not None:
+                    requests.append((symbol, asset_type, trailing_stop_order(qty, trail_amount, action)))
+
+        # --- Send the whole iteration's orders in one batch ---
+        trades = pool.submit_orders(requests)
+    except Exception:
+        # Leave no claim pending: a later pass may claim these signals again
+        for key in claimed:
+            ledger.mark_failed(key)
+        raise
+    for group, start, end in groups:
+        register_group(group, trades[start:end])
+    for key in claimed:
+        trace_finish(key)
+        ledger.mark_done(key)
+    return len(claimed)
 
 def automation_loop():
+    setup_logging()
     ib = connect_ibkr()
+    start_export()
+    if IB_STREAM_TRAILING_STOPS:
+        from market_data import TrailingStopManager  # imports ibkr itself
+        TrailingStopManager(ib).start()
 
     try:
         while True:
-            process_signals(ib, portfolio_value=100000)
-            time.sleep(60)  # check every 60 seconds
+            with timer("ibkr.process_signals"):
+                process_signals(ib)
+            ib.sleep(60)  # check every 60 seconds, handling market data/order events meanwhile
     except KeyboardInterrupt:
         print("🛑 Automation stopped manually")
     finally:
@@ -0,0 +1,118 @@
+"""
+Non-blocking logging for the OCR and trading loops.
+
+setup_logging() puts a single QueueHandler on the root logger; a QueueListener
+thread does the console and trading.log writes, so a hot path only pays for
+building the record and a queue put. Filters on the QueueHandler drop records
+before they are queued:
+
+- DEBUG records are sampled (every LOG_DEBUG_SAMPLE_EVERY-th per call site)
+- records logged with extra={"rate_key": ...} go out at most once per
+  LOG_RATE_LIMIT_INTERVAL per key, with a count of what was suppressed
+
+Fields passed through `extra` are kept as structured fields in the JSON file
+log (LOG_JSON) and ignored by the console.
+"""
+import atexit
+import json
+import logging
+import queue
+import sys
+import time
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
+
+from config import (
+    LOG_CONSOLE_LEVEL, LOG_DEBUG_SAMPLE_EVERY, LOG_FILE, LOG_FILE_BACKUPS, LOG_FILE_MAX_BYTES, LOG_JSON, LOG_LEVEL,
+    LOG_RATE_LIMIT_INTERVAL,
+)
+
+# Attributes every LogRecord has; anything else came from `extra`
+_RECORD_ATTRS = set(vars(logging.LogRecord("", 0, "", 0, "", (), None))) | {"message", "asctime"}
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per record: time, level, logger, message and any `extra` fields."""
+
+    def format(self, record):
+        entry = {
+            "ts": round(record.created, 6),
+            "level": record.levelname,
+            "logger": record.name,
+            "msg": record.getMessage(),
+        }
+        for key, value in vars(record).items():
+            if key not in _RECORD_ATTRS:
+                entry[key] = value
+        if record.exc_info:
+            entry["exc"] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str, ensure_ascii=False)
+
+
+class DebugSampler(logging.Filter):
+    """Let through every n-th DEBUG record per call site (logger, file, line)."""
+
+    def __init__(self, every=LOG_DEBUG_SAMPLE_EVERY):
+        super().__init__()
+        self.every = every
+        self.seen = {}
+
+    def filter(self, record):
+        if record.levelno != logging.DEBUG or self.every <= 1:
+            return True
+        site = (record.name, record.pathname, record.lineno)
+        n = self.seen.get(site, 0)
+        self.seen[site] = n + 1
+        return n % self.every == 0
+
+
+class RateLimiter(logging.Filter):
+    """At most one record per rate_key per interval; the next one carries the suppressed count."""
+
+    def __init__(self, interval=LOG_RATE_LIMIT_INTERVAL):
+        super().__init__()
+        self.interval = interval
+        self.last = {}
+        self.suppressed = {}
+
+    def filter(self, record):
+        key = getattr(record, "rate_key", None)
+        if key is None:
+            return True
+        now = time.monotonic()
+        if now - self.last.get(key, float("-inf")) < self.interval:
+            self.suppressed[key] = self.suppressed.get(key, 0) + 1
+            return False
+        self.last[key] = now
+        record.suppressed = self.suppressed.pop(key, 0)
+        if record.suppressed:
+            record.msg = f"{record.msg} (+{record.suppressed} suppressed)"
+        return True
+
+
+_listener = None
+
+def setup_logging(level=LOG_LEVEL, console_level=LOG_CONSOLE_LEVEL, path=LOG_FILE):
+    """Route the root logger through a queue to the console and a rotating log file. Idempotent."""
+    global _listener
+    if _listener is not None:
+        return _listener
+
+    console = logging.StreamHandler(sys.stdout)
+    console.setLevel(console_level)
+    console.setFormatter(logging.Formatter("%(message)s"))
+    file_handler = RotatingFileHandler(path, maxBytes=LOG_FILE_MAX_BYTES, backupCount=LOG_FILE_BACKUPS, encoding="utf-8")
+    file_handler.setFormatter(JsonFormatter() if LOG_JSON else logging.Formatter("%(asctime)s [%(levelname)s] %(message)s"))
+
+    records = queue.SimpleQueue()
+    queue_handler = QueueHandler(records)
+    queue_handler.addFilter(DebugSampler())
+    queue_handler.addFilter(RateLimiter())
+
+    root = logging.getLogger()
+    root.setLevel(level)
+    root.addHandler(queue_handler)
+
+    _listener = QueueListener(records, console, file_handler, respect_handler_level=True)
+    _listener.start()
+    atexit.register(_listener.stop)
+    return _listener
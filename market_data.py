@@ -0,0 +1,144 @@
+import logging
+import math
+
+import numpy as np
+
+from config import MD_MAX_SYMBOLS
+from ib_pool import as_pool
+from ibkr import stop_loss_progression
+from order_book import book_symbol, get_order_book
+
+log = logging.getLogger(__name__)
+
+LAST, BID, ASK = range(3)
+
+
+class MarketDataTable:
+    """
+    Fixed-capacity last/bid/ask table. Symbols are assigned array slots,
+    so memory is bounded by capacity no matter how many symbols come and go.
+    """
+
+    def __init__(self, capacity=MD_MAX_SYMBOLS):
+        self.prices = np.full((capacity, 3), np.nan)
+        self.updated = np.zeros(capacity)
+        self.slots = {}
+        self.free = list(range(capacity - 1, -1, -1))
+
+    def add(self, symbol):
+        """Slot for symbol, or None when the table is full."""
+        if symbol in self.slots:
+            return self.slots[symbol]
+        if not self.free:
+            return None
+        slot = self.free.pop()
+        self.prices[slot] = np.nan
+        self.slots[symbol] = slot
+        return slot
+
+    def remove(self, symbol):
+        slot = self.slots.pop(symbol, None)
+        if slot is not None:
+            self.prices[slot] = np.nan
+            self.free.append(slot)
+
+    def update(self, symbol, last, bid, ask, timestamp):
+        slot = self.slots.get(symbol)
+        if slot is None:
+            return
+        self.prices[slot] = (last, bid, ask)
+        self.updated[slot] = timestamp
+
+    def last(self, symbol):
+        slot = self.slots.get(symbol)
+        return np.nan if slot is None else self.prices[slot, LAST]
+
+
+class TrailingStopManager:
+    """
+    Streams quotes (reqMktData) only for symbols with an open position and,
+    on every tick, re-evaluates stop_loss_progression from the live price.
+    When the band changes, the existing TRAIL order is amended in place
+    (same orderId) instead of placing a new one. Flat positions unsubscribe.
+    After a reconnect the subscriptions are requested again (a new session has none).
+    Given an IBPool, quotes come over its market data connection and each
+    amendment goes to the order connection that owns the symbol.
+    """
+
+    def __init__(self, ib, table=None):
+        self.pool = as_pool(ib)
+        self.ib = self.pool.market_data()
+        self.table = table or MarketDataTable()
+        self.contracts = {}  # symbol -> subscribed contract
+        self.positions = {}  # symbol -> (signed qty, avg cost)
+        self.stop_bps = {}  # symbol -> band the trailing stop is currently set to
+
+    def start(self):
+        self.ib.positionEvent += self.on_position
+        self.ib.pendingTickersEvent += self.on_tickers
+        self.ib.connectedEvent += self.on_connected
+        for position in self.ib.positions():
+            self.on_position(position)
+        return self
+
+    def on_connected(self):
+        """Re-request quotes for the symbols still held; subscribe ones opened while disconnected."""
+        held = {book_symbol(p.contract) for p in self.ib.positions() if p.position}
+        for symbol in [s for s in self.contracts if s not in held]:
+            self.unsubscribe(symbol, cancel=False)
+        for contract in self.contracts.values():
+            self.ib.reqMktData(contract, "", False, False)
+        for position in self.ib.positions():
+            self.on_position(position)
+        if self.contracts:
+            log.info("🔁 Re-subscribed market data for %d symbols", len(self.contracts))
+
+    def on_position(self, position):
+        contract = position.contract
+        symbol = book_symbol(contract)
+        if position.position == 0:
+            self.unsubscribe(symbol)
+            return
+        self.positions[symbol] = (position.position, position.avgCost)
+        if symbol in self.contracts:
+            return
+        if self.table.add(symbol) is None:
+            log.warning("⚠️ Market data table full, not streaming %s", symbol, extra={"rate_key": "md.table_full"})
+            return
+        if not contract.exchange:
+            contract.exchange = "IDEALPRO" if contract.secType == "CASH" else "SMART"
+        self.contracts[symbol] = contract
+        self.ib.reqMktData(contract, "", False, False)
+
+    def unsubscribe(self, symbol, cancel=True):
+        contract = self.contracts.pop(symbol, None)
+        if contract is not None and cancel:
+            self.ib.cancelMktData(contract)
+        self.table.remove(symbol)
+        self.positions.pop(symbol, None)
+        self.stop_bps.pop(symbol, None)
+
+    def on_tickers(self, tickers):
+        for ticker in tickers:
+            symbol = book_symbol(ticker.contract)
+            if symbol not in self.positions:
+                continue
+            last = ticker.last if not math.isnan(ticker.last) else ticker.midpoint()
+            self.table.update(symbol, last, ticker.bid, ticker.ask, ticker.time.timestamp() if ticker.time else 0)
+            self.evaluate(symbol)
+
+    def evaluate(self, symbol):
+        qty, entry = self.positions[symbol]
+        last = self.table.last(symbol)
+        if not entry or math.isnan(last):
+            return
+        direction = 1 if qty > 0 else -1
+        profit_bps = direction * (last - entry) / entry * 10000
+        sl_bps = stop_loss_progression(profit_bps)
+        if sl_bps == self.stop_bps.get(symbol):
+            return
+        for trade in get_order_book(self.pool).orders(symbol):
+            if trade.order.orderType == "TRAIL":
+                trade.order.trailingAmount = sl_bps / 10000
+                self.pool.for_symbol(symbol).placeOrder(trade.contract, trade.order)  # same orderId: modifies the order
+        self.stop_bps[symbol] = sl_bps
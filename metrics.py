@@ -0,0 +1,268 @@
+"""
+Lightweight in-process metrics: stage latency histograms, a signal-to-wire
+trace keyed by UniqueKey, and export as Prometheus text over HTTP or as a
+rotating JSONL file.
+
+    with timer("ocr.extract_table"):         # or @timer("order.submit")
+        ...
+    trace_mark(key, "captured", t)           # first mark starts the trace
+    trace_finish(key)                        # orders sent: observe signal_to_wire
+
+An observation is two perf_counter calls, a bisect and a locked increment,
+so the timers can stay on in production (METRICS_ENABLED turns them off).
+"""
+import atexit
+import bisect
+import json
+import logging
+import queue
+import threading
+import time
+from collections import OrderedDict, deque
+from contextlib import ContextDecorator
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from logging.handlers import RotatingFileHandler
+
+from config import (
+    METRICS_ENABLED, METRICS_EXPORT, METRICS_FLUSH_INTERVAL, METRICS_JSONL_BACKUPS, METRICS_JSONL_MAX_BYTES,
+    METRICS_JSONL_PATH, METRICS_PORT, METRICS_TRACE_MAX_KEYS,
+)
+
+# Seconds: from a row-cache hit to a slow IB round-trip
+LATENCY_BUCKETS = (
+    0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05,
+    0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0,
+)
+
+
+class Histogram:
+    """Fixed-bucket latency histogram (Prometheus semantics: bucket i counts values <= buckets[i])."""
+
+    def __init__(self, name, buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)  # last slot is +Inf
+        self.sum = 0.0
+        self.count = 0
+        self.lock = threading.Lock()
+
+    def observe(self, value):
+        i = bisect.bisect_left(self.buckets, value)
+        with self.lock:
+            self.counts[i] += 1
+            self.sum += value
+            self.count += 1
+
+    def quantile(self, q):
+        """Upper bound of the bucket holding the q-quantile (None when empty)."""
+        with self.lock:
+            counts, total = list(self.counts), self.count
+        if not total:
+            return None
+        rank = q * total
+        seen = 0
+        for bound, n in zip(self.buckets + (float("inf"),), counts):
+            seen += n
+            if seen >= rank:
+                return bound
+        return float("inf")
+
+    def snapshot(self):
+        return {
+            "count": self.count,
+            "sum": self.sum,
+            "p50": self.quantile(0.5),
+            "p95": self.quantile(0.95),
+            "p99": self.quantile(0.99),
+        }
+
+
+_histograms = {}
+_histograms_lock = threading.Lock()
+
+def histogram(name):
+    h = _histograms.get(name)
+    if h is None:
+        with _histograms_lock:
+            h = _histograms.setdefault(name, Histogram(name))
+    return h
+
+def observe(name, seconds):
+    if METRICS_ENABLED:
+        histogram(name).observe(seconds)
+
+class timer(ContextDecorator):
+    """Time a block or function into the `name` histogram; .elapsed holds the last duration."""
+
+    def __init__(self, name):
+        self.name = name
+        self.elapsed = None
+
+    def _recreate_cm(self):
+        # A fresh instance per decorated call, so concurrent calls don't share start times
+        return timer(self.name)
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.elapsed = time.perf_counter() - self.start
+        observe(self.name, self.elapsed)
+        return False
+
+
+# ========= SIGNAL-TO-WIRE TRACE =========
+class SignalTrace:
+    """
+    Stage marks per signal UniqueKey (perf_counter, so in-process only).
+    Unfinished traces beyond max_keys are dropped oldest first.
+    """
+
+    def __init__(self, max_keys=METRICS_TRACE_MAX_KEYS):
+        self.max_keys = max_keys
+        self.marks = OrderedDict()
+        self.recent = deque(maxlen=100)
+        self.lock = threading.Lock()
+
+    def mark(self, key, stage, t=None):
+        if not METRICS_ENABLED:
+            return
+        t = time.perf_counter() if t is None else t
+        with self.lock:
+            marks = self.marks.get(key)
+            if marks is None:
+                marks = self.marks[key] = []
+                if len(self.marks) > self.max_keys:
+                    self.marks.popitem(last=False)
+            marks.append((stage, t))
+
+    def finish(self, key, stage="wire"):
+        """Close the trace: observe signal_to_wire and return the trace record (None if never started)."""
+        t = time.perf_counter()
+        with self.lock:
+            marks = self.marks.pop(key, None)
+        if not marks:
+            return None
+        origin = marks[0][1]
+        record = {
+            "key": key,
+            "start": marks[0][0],
+            "stages_ms": {name: round((ts - origin) * 1000, 3) for name, ts in marks[1:] + [(stage, t)]},
+            "signal_to_wire_ms": round((t - origin) * 1000, 3),
+        }
+        observe("signal_to_wire", t - origin)
+        self.recent.append(record)
+        if _jsonl_log is not None:
+            # Written by the export thread, off the order path
+            _trace_queue.put({"ts": time.time(), "type": "trace", **record})
+        return record
+
+signal_trace = SignalTrace()
+
+def trace_mark(key, stage, t=None):
+    signal_trace.mark(key, stage, t)
+
+def trace_finish(key, stage="wire"):
+    return signal_trace.finish(key, stage)
+
+
+# ========= EXPORT =========
+def snapshot():
+    return {name: h.snapshot() for name, h in sorted(_histograms.items())}
+
+def prometheus_text():
+    """Every histogram as one stage_latency_seconds family, labelled by stage."""
+    lines = [
+        "# HELP stage_latency_seconds Latency of each pipeline stage.",
+        "# TYPE stage_latency_seconds histogram",
+    ]
+    for name, h in sorted(_histograms.items()):
+        with h.lock:
+            counts, total, count = list(h.counts), h.sum, h.count
+        cumulative = 0
+        for bound, n in zip(h.buckets, counts):
+            cumulative += n
+            lines.append(f'stage_latency_seconds_bucket{{stage="{name}",le="{bound}"}} {cumulative}')
+        lines.append(f'stage_latency_seconds_bucket{{stage="{name}",le="+Inf"}} {count}')
+        lines.append(f'stage_latency_seconds_sum{{stage="{name}"}} {total}')
+        lines.append(f'stage_latency_seconds_count{{stage="{name}"}} {count}')
+    return "\n".join(lines) + "\n"
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path != "/metrics":
+            self.send_error(404)
+            return
+        body = prometheus_text().encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass  # no access log per scrape
+
+def serve_prometheus(port=METRICS_PORT, host="127.0.0.1"):
+    server = ThreadingHTTPServer((host, port), _MetricsHandler)
+    threading.Thread(target=server.serve_forever, name="metrics-http", daemon=True).start()
+    print(f"📈 Metrics at http://{host}:{port}/metrics")
+    return server
+
+_jsonl_log = None
+_trace_queue = queue.SimpleQueue()  # finished trace records waiting for the export thread
+
+def _write_traces():
+    while True:
+        try:
+            record = _trace_queue.get_nowait()
+        except queue.Empty:
+            return
+        _jsonl_log.info(json.dumps(record))
+
+def flush_jsonl():
+    if _jsonl_log is not None:
+        _write_traces()
+        _jsonl_log.info(json.dumps({"ts": time.time(), "type": "histograms", "stages": snapshot()}))
+
+def start_jsonl(path=METRICS_JSONL_PATH, interval=METRICS_FLUSH_INTERVAL):
+    """
+    Append a histogram snapshot every interval seconds, and finished traces as
+    they close; both are written by one export thread.
+    """
+    global _jsonl_log
+    if _jsonl_log is not None:
+        return
+    handler = RotatingFileHandler(path, maxBytes=METRICS_JSONL_MAX_BYTES, backupCount=METRICS_JSONL_BACKUPS)
+    handler.setFormatter(logging.Formatter("%(message)s"))
+    log = logging.getLogger("metrics")
+    log.addHandler(handler)
+    log.setLevel(logging.INFO)
+    log.propagate = False
+    _jsonl_log = log
+
+    def flush_forever():
+        next_flush = time.monotonic() + interval
+        while True:
+            try:
+                record = _trace_queue.get(timeout=max(0.0, next_flush - time.monotonic()))
+            except queue.Empty:
+                flush_jsonl()
+                next_flush = time.monotonic() + interval
+                continue
+            _jsonl_log.info(json.dumps(record))
+
+    threading.Thread(target=flush_forever, name="metrics-jsonl", daemon=True).start()
+    atexit.register(flush_jsonl)
+
+def start_export(mode=METRICS_EXPORT):
+    """Start the configured exporter: "prometheus", "jsonl" or "off"."""
+    if not METRICS_ENABLED or mode == "off":
+        return
+    if mode == "prometheus":
+        serve_prometheus()
+    elif mode == "jsonl":
+        start_jsonl()
+    else:
+        raise ValueError(f"Unknown METRICS_EXPORT {mode!r}")
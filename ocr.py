@@ -1,11 +1,21 @@
+import argparse
 import cv2
+import logging
+import numpy as np
+import pandas as pd
 import pytesseract
 import os
 import time
-from openpyxl import Workbook, load_workbook
-import re
-import pyautogui
-import pygetwindow as gw
+from openpyxl import load_workbook
+from concurrent.futures import ThreadPoolExecutor
+from capture import FrameDiff, ReplaySource, ScreenSource
+from config import OCR_DEBUG_DUMP, OCR_OMP_THREAD_LIMIT, OCR_POLL_INTERVAL, OCR_ROW_CACHE_SIZE, OCR_WORKERS
+from dedup_index import fingerprint, fingerprint_text, get_dedup_index
+from log_setup import setup_logging
+from row_parser import parse_rows
+from metrics import observe, start_export, timer, trace_mark
+from signal_store import get_signal_ledger, get_signal_store
+from row_cache import RowHashCache, binarize, strip_hash
 # Optional if Tesseract is not in PATH
 # pytesseract.pytesseract.tesseract_cmd = r"C:\Program Files\Tesseract-OCR\tesseract.exe"
 
@@ -13,59 +23,147 @@ image_path = 'table.png'
 excel_file = 'ocr_results.xlsx'
 previous_source_file = 'previous_source.xlsx'
 
-# Keep track of previously seen rows
-previous_rows = set()
-header_saved = False
-
-# Create workbook if it doesn’t exist
-if not os.path.exists(excel_file):
-    wb = Workbook()
-    ws = wb.active
-    ws.title = "OCR Result Data"
-    wb.save(excel_file)
-if not os.path.exists(previous_source_file):
-    wb = Workbook()
-    ws = wb.active
-    ws.title = "OCR Source Data"
-    wb.save(previous_source_file)
-else:
-    wb = load_workbook(previous_source_file)
-    ws = wb.active
-    for i, row in enumerate(ws.iter_rows(values_only=True)):
-        if i == 0:
-            continue
-        previous_rows.add(tuple(row))  # Full row tuple
-    wb.close()
-def get_screen():
-    windows = [w for w in gw.getWindowsWithTitle("Triggers List") if w.visible] 
-    if not windows: raise Exception("Triggers List window not found. Please open it and make sure it's visible.") 
-    stealth_win = windows[0] 
-    # 2. Take a screenshot of the window 
-    screenshot = pyautogui.screenshot(region=(stealth_win.left, stealth_win.top, stealth_win.width, stealth_win.height)) 
-    # Save full screenshot 
-    full_screenshot_path = os.path.join(os.getcwd(), "table.png") 
-    screenshot.save(full_screenshot_path) 
-    print(f"📸 Full screenshot saved: {full_screenshot_path}") 
-    return screenshot
-
-def clean_signal_time(signal_time_str):
-    # Fix common OCR errors and insert space between date and time
-    # Example fix: '2025-08-0723:45:00' -> '2025-08-07 23:45:00'
-    fixed = re.sub(r"(\d{4}-\d{2}-\d{2})(\d{2}:\d{2}:\d{2})", r"\1 \2", signal_time_str)
-
-    # Remove invalid seconds (e.g. 63, 65), clamp to 59 if needed
-    # Extract hh:mm:ss part
-    parts = fixed.split()
-    if len(parts) == 2:
-        time_part = parts[1]
-        h, m, s = time_part.split(':')
-        s = int(s)
-        if s > 59:
-            s = 59
-        fixed = f"{parts[0]} {h}:{m}:{s:02d}"
-    return fixed
-
-def extract_table(image):
+OCR_WHITELIST = '0123456789.:+-ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz'
+OCR_CONFIG = f'--psm 6 -c tessedit_char_whitelist={OCR_WHITELIST}'
+TILE_GAP = 20  # blank pixels around every cell in the batched OCR canvas
+MIN_CELLS_PER_WORKER = 8  # below this, another Tesseract launch costs more than it saves
+
+# Tesseract subprocesses inherit this; keeps OCR_WORKERS processes from oversubscribing cores
+os.environ.setdefault("OMP_THREAD_LIMIT", str(OCR_OMP_THREAD_LIMIT))
+ocr_executor = None
+
+log = logging.getLogger(__name__)
+
+# Stage timings (seconds) of the most recent capture cycle
+last_timings = {}
+
+# Frame-to-frame change detection, so unchanged frames and rows skip OCR
+frame_diff = FrameDiff()
+
+# OCR results per row strip, so unchanged rows skip Tesseract
+row_cache = RowHashCache(
+    os.path.splitext(previous_source_file)[0] + "_rowcache.json", OCR_ROW_CACHE_SIZE
+).load()
+
+def init_store():
+    """
+    Open the signal store, import the legacy workbooks into it on first run
+    (with the ledger's watermark set past the imported signals, so they are not
+    ordered again), and seed the dedup index from the stored rows the first time it is used.
+    """
+    store = get_signal_store()
+    if store.is_empty():
+        if os.path.exists(previous_source_file):
+            wb = load_workbook(previous_source_file, read_only=True)
+            store.append_source([row for i, row in enumerate(wb.active.iter_rows(values_only=True)) if i > 0])
+            wb.close()
+        if os.path.exists(excel_file):
+            wb = load_workbook(excel_file, read_only=True)
+            store.append_signals([row for i, row in enumerate(wb.active.iter_rows(values_only=True)) if i > 0])
+            wb.close()
+            # Imported history was traded by the old loop: start the watermark after it
+            imported = store.read_signals()
+            ledger = get_signal_ledger()
+            if not imported.empty and ledger.watermark() == 0:
+                ledger.set_watermark(int(imported["SignalId"].max()))
+    index = get_dedup_index()
+    if not index.migrated():
+        # One-off migration, marked done in the index itself: rows older than the
+        # window leave no key, so an empty index does not mean it still has to run
+        history = parse_rows(store.source_rows())
+        index.record(batch_fingerprints(history), batch_seen_at(history))
+        index.mark_migrated()
+    return store
+
+MAX_ROW_HEIGHT = 60  # a table row is one line of text; taller boxes are the window and table frames
+
+def split_frames(rows):
+    """(frames, data rows) of a detected grid: boxes taller than a text line enclose the data rows."""
+    frames = [r for r in rows if len(r) and r[:, 3].max() > MAX_ROW_HEIGHT]
+    data = [r for r in rows if len(r) and r[:, 3].max() <= MAX_ROW_HEIGHT]
+    return frames, data
+
+class TableLayout:
+    """
+    Cell boxes of a detected grid, reused across frames while the grid is unchanged.
+    rows is a list of (n_cols, 4) int arrays of x, y, w, h.
+    """
+    MAX_PROBES = 64
+    MIN_PROBE_MATCH = 0.95
+    MAX_INK_CHANGE = 0.01  # change in the dark share of the empty table area that means rows appeared
+
+    def __init__(self, image, rows):
+        self.shape = image.shape
+        self.rows = rows
+        self.empty_area = self._empty_area(rows, image.shape)
+        self.empty_ink = self._ink(image)
+        widest = max(rows, key=len) if rows else np.empty((0, 4), dtype=np.int32)
+        self.col_bounds = np.unique(np.concatenate([widest[:, 0], widest[:, 0] + widest[:, 2]]))
+        row_tops = np.array([r[:, 1].min() for r in rows if len(r)])
+        self.row_pitch = float(np.median(np.diff(row_tops))) if len(row_tops) > 1 else 0.0
+
+        # Probe the middle of each box's top and left edge, which lie on grid lines.
+        # Keep the ones that are actually dark in this frame.
+        if rows:
+            boxes = np.concatenate(rows)
+            x, y, w, h = boxes.T
+            probes = np.concatenate([
+                np.stack([y, x + w // 2], axis=1),
+                np.stack([y + h // 2, x], axis=1),
+            ])
+            probes = probes[self._is_line(image, probes)]
+            step = max(1, len(probes) // self.MAX_PROBES)
+            self.probes = probes[::step]
+        else:
+            self.probes = np.empty((0, 2), dtype=np.int32)
+
+    @staticmethod
+    def _is_line(image, points):
+        b, g, r = image[points[:, 0], points[:, 1]].T.astype(np.float32)
+        return 0.114 * b + 0.587 * g + 0.299 * r <= 200
+
+    @staticmethod
+    def _empty_area(rows, shape):
+        """
+        (y0, y1, x0, x1) of the table below the last data row (the whole table when
+        it has none): where rows added after detection show up.
+        """
+        frames, data = split_frames(rows)
+        if frames:
+            x, y, w, h = min((b for f in frames for b in f), key=lambda b: b[2] * b[3]).tolist()
+        else:
+            x, y, w, h = 0, 0, shape[1], shape[0]
+        top = max((int((r[:, 1] + r[:, 3]).max()) for r in data), default=y)
+        return top + 2, y + h - 2, x + 3, x + w - 3
+
+    def _ink(self, image):
+        """Dark share of the empty area, on a 2x4 pixel sample."""
+        y0, y1, x0, x1 = self.empty_area
+        area = image[y0:y1:2, x0:x1:4]
+        if not area.size:
+            return 0.0
+        b, g, r = area.reshape(-1, 3).T.astype(np.float32)
+        return float((0.114 * b + 0.587 * g + 0.299 * r <= 200).mean())
+
+    def matches(self, image):
+        """
+        Cheap validity check: same frame size, the grid lines are still where they
+        were, and nothing appeared in the empty part of the table (new rows).
+        """
+        if image.shape != self.shape or not len(self.probes):
+            return False
+        if self._is_line(image, self.probes).mean() < self.MIN_PROBE_MATCH:
+            return False
+        return abs(self._ink(image) - self.empty_ink) <= self.MAX_INK_CHANGE
+
+# Grid layout of the last full detection
+table_layout = None
+
+def extract_table(image, use_cache=True):
+    global table_layout
+    if use_cache and table_layout is not None and table_layout.matches(image):
+        return table_layout.rows
+
     gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
     _, thresh = cv2.threshold(gray, 200, 255, cv2.THRESH_BINARY_INV)
 
@@ -79,147 +177,288 @@ def extract_table(image):
     contours, _ = cv2.findContours(grid, cv2.RETR_TREE, cv2.CHAIN_APPROX_SIMPLE)
 
     # Sort into rows
-    def sort_contours(cnts):
-        cnts = sorted(cnts, key=lambda c: cv2.boundingRect(c)[1])
+    def sort_boxes(cnts):
+        if not cnts:
+            return []
+        boxes = np.array([cv2.boundingRect(c) for c in cnts], dtype=np.int32)
+        boxes = boxes[np.argsort(boxes[:, 1], kind="stable")]
+        boxes = boxes[(boxes[:, 2] >= 20) & (boxes[:, 3] >= 15)]
         rows = []
-        current_row = []
-        last_y = None
-        for c in cnts:
-            x, y, w, h = cv2.boundingRect(c)
-            if w < 20 or h < 15:
-                continue
-            if last_y is None or abs(y - last_y) < 10:
-                current_row.append(c)
-                last_y = y
-            else:
-                rows.append(sorted(current_row, key=lambda c: cv2.boundingRect(c)[0]))
-                current_row = [c]
-                last_y = y
-        if current_row:
-            rows.append(sorted(current_row, key=lambda c: cv2.boundingRect(c)[0]))
-        return rows
+        start = 0
+        for i in range(1, len(boxes)):
+            if abs(boxes[i, 1] - boxes[i - 1, 1]) >= 10:
+                rows.append(boxes[start:i])
+                start = i
+        if len(boxes):
+            rows.append(boxes[start:])
+        return [row[np.argsort(row[:, 0], kind="stable")] for row in rows]
+
+    rows = sort_boxes(contours)
+    table_layout = TableLayout(image, rows)
+    return rows
+
+def tile_cells(cell_images):
+    """
+    Stack cell images vertically into one canvas so Tesseract runs once per frame.
+    Returns the canvas and the top y offset of every cell band.
+    """
+    width = max(c.shape[1] for c in cell_images) + 2 * TILE_GAP
+    height = sum(c.shape[0] + TILE_GAP for c in cell_images) + TILE_GAP
+    canvas = np.zeros((height, width), dtype=np.uint8)
+    tops = np.empty(len(cell_images), dtype=np.int64)
+    y = TILE_GAP
+    for i, c in enumerate(cell_images):
+        h, w = c.shape
+        canvas[y:y+h, TILE_GAP:TILE_GAP+w] = c
+        tops[i] = y
+        y += h + TILE_GAP
+    return canvas, tops
+
+def words_to_cells(data, tops):
+    """Map image_to_data word boxes back to the cell band they were tiled into."""
+    texts = [[] for _ in range(len(tops))]
+    centers = np.asarray(data['top']) + np.asarray(data['height']) // 2
+    cell_idx = np.searchsorted(tops, centers, side='right') - 1
+    for i, word in enumerate(data['text']):
+        word = word.strip()
+        if not word or cell_idx[i] < 0:
+            continue
+        texts[cell_idx[i]].append(
+            (data['block_num'][i], data['par_num'][i], data['line_num'][i], data['left'][i], word)
+        )
+
+    cells = []
+    for words in texts:
+        lines = {}
+        for block, par, line, _, word in sorted(words):
+            lines.setdefault((block, par, line), []).append(word)
+        cells.append("\n".join(" ".join(ws) for ws in lines.values()))
+    return cells
 
-    return sort_contours(contours)
+def ocr_chunk(cell_images):
+    canvas, tops = tile_cells(cell_images)
+    data = pytesseract.image_to_data(canvas, config=OCR_CONFIG, output_type=pytesseract.Output.DICT)
+    return words_to_cells(data, tops)
 
-def ocr_table(image, rows):
-    table_data = []
+def ocr_cells(cell_images):
+    """
+    OCR cell images split into contiguous chunks, one Tesseract process per chunk.
+    Chunks run on a thread pool (the work happens in the subprocesses) and the
+    texts come back in input order.
+    """
+    global ocr_executor
+    n_chunks = max(1, min(OCR_WORKERS, len(cell_images) // MIN_CELLS_PER_WORKER))
+    if n_chunks == 1:
+        return ocr_chunk(cell_images)
+
+    if ocr_executor is None:
+        ocr_executor = ThreadPoolExecutor(max_workers=OCR_WORKERS, thread_name_prefix="ocr")
+    bounds = np.linspace(0, len(cell_images), n_chunks + 1).astype(int)
+    chunks = [cell_images[a:b] for a, b in zip(bounds[:-1], bounds[1:])]
+    return [text for texts in ocr_executor.map(ocr_chunk, chunks) for text in texts]
+
+def ocr_table(image, rows, cache=None):
+    """
+    OCR every cell of the table in one batched Tesseract call per worker.
+    With a RowHashCache, rows whose strip was seen before reuse the cached texts.
+    """
+    start = time.perf_counter()
+    if not rows:
+        return []
+    # Threshold only the rows' bounding box and work in its coordinates
+    boxes = np.concatenate(rows)
+    ox, oy = boxes[:, 0].min(), boxes[:, 1].min()
+    thresh = binarize(image[oy:(boxes[:, 1] + boxes[:, 3]).max(), ox:(boxes[:, 0] + boxes[:, 2]).max()])
+    rows = [row - np.array([ox, oy, 0, 0], dtype=row.dtype) for row in rows]
+
+    table_data = [None] * len(rows)
+    missed = {}
+    positions = []
+    cell_images = []
     for row_i, row in enumerate(rows):
-        row_texts = []
-        for col_i, cell in enumerate(row):
-            x, y, w, h = cv2.boundingRect(cell)
-            roi = image[y:y+h, x:x+w]
-            roi_gray = cv2.cvtColor(roi, cv2.COLOR_BGR2GRAY)
-            _, roi_thresh = cv2.threshold(roi_gray, 200, 255, cv2.THRESH_BINARY_INV)
-            text = pytesseract.image_to_string(
-                roi_thresh,
-                config='--psm 6 -c tessedit_char_whitelist=0123456789.:+-ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz'
-            ).strip()
-            # Clean SignalTime column (assume first column)
-            if row_i > 0 and col_i == 0 and text:
-                text = clean_signal_time(text)
-            row_texts.append(text)
-        table_data.append(row_texts)
+        if cache is not None and len(row):
+            x0, y0 = row[:, 0].min(), row[:, 1].min()
+            x1, y1 = (row[:, 0] + row[:, 2]).max(), (row[:, 1] + row[:, 3]).max()
+            key = strip_hash(thresh[y0:y1, x0:x1])
+            cached = cache.get(key)
+            if cached is not None:
+                table_data[row_i] = list(cached)
+                continue
+            missed[row_i] = key
+        table_data[row_i] = []
+        for col_i, (x, y, w, h) in enumerate(row.tolist()):
+            positions.append((row_i, col_i))
+            cell_images.append(thresh[y:y+h, x:x+w])
+
+    if not cell_images:
+        return table_data
+
+    prepared = time.perf_counter()
+    texts = ocr_cells(cell_images)
+    recognized = time.perf_counter()
+
+    for (row_i, col_i), text in zip(positions, texts):
+        table_data[row_i].append(text.strip())
+
+    if cache is not None:
+        for row_i, key in missed.items():
+            cache.put(key, table_data[row_i])
+
+    last_timings['ocr_prepare'] = prepared - start
+    last_timings['ocr_tesseract'] = recognized - prepared
+    observe("ocr.prepare", prepared - start)
+    observe("ocr.tesseract", recognized - prepared)
+    last_timings['ocr_cells'] = len(cell_images)
     return table_data
 
 def highlight_new_rows(image, rows, new_rows_data):
     for i, row in enumerate(rows):
         row_data = new_rows_data[i] if i < len(new_rows_data) else None
-        for j, cell in enumerate(row):
-            x, y, w, h = cv2.boundingRect(cell)
+        for x, y, w, h in row.tolist():
             if row_data and any(row_data):
                 cv2.rectangle(image, (x, y), (x+w, y+h), (0, 255, 0), 2)  # Green for new
             else:
                 cv2.rectangle(image, (x, y), (x+w, y+h), (128, 128, 128), 1)  # Gray for old
     return image
 
-def append_to_excel(header, data_rows):
-    global header_saved
-    print(header, "header")
-    print(data_rows, "data_rows")
-    wb = load_workbook(excel_file)
-    ws = wb.active
-
-    if not header_saved:
-        if ws.max_row == 1 and not any(ws.iter_rows(values_only=True)):
-            init_header = header[0].split()
-            init_header[0] = "SignalDate"
-            update_header = init_header[:1] + ["SignalTime"] + init_header[1:9]
-            ws.append(update_header)
-        header_saved = True
-
-    for row in data_rows:
-        init_row = row[0].split()
-        init_row[2] = init_row[2][:3] + "." + init_row[2][-3:]
-        for i in range(4,len(init_row)):
-            if "o" in init_row[i]:
-                if(init_row[i][0] == "o"):
-                    init_row[i] = init_row[i].replace("o", "9.")
-                else:
-                    init_row[i] = init_row[i].replace("o", "9")
-        ws.append(init_row[0:10])
-
-    wb.save(excel_file)
-    wb.close()
-
-def append_to_source_excel(header, data_rows):
-    global header_saved
-    print(header, "header")
-    print(data_rows, "data_rows")
-    wb = load_workbook(previous_source_file)
-    ws = wb.active
-
-    if not header_saved:
-        if ws.max_row == 1 and not any(ws.iter_rows(values_only=True)):
-            ws.append(header)
-        header_saved = True
-
-    for row in data_rows:
-        ws.append(row)
-
-    wb.save(previous_source_file)
-    wb.close()
-print("🔍 Watching for table updates... Press Ctrl+C to stop.")
-try:
-    while True:
-        get_screen()
-        if os.path.exists(image_path):
-            img = cv2.imread(image_path)
-            table_rows = extract_table(img)
-            table_data = ocr_table(img, table_rows)
-            print(table_data, "111111")
-            if not table_data:
-                time.sleep(5)
-                continue
+def batch_fingerprints(batch):
+    """Dedup key per raw row: normalized (date, time, symbol) where it parsed, the raw text otherwise."""
+    fps = [None] * len(batch)
+    for pos, date, time_, symbol in zip(batch.text.index, batch.text["SignalDate"], batch.text["SignalTime"], batch.text["Symbol"]):
+        fps[pos] = fingerprint(date, time_, symbol)
+    for pos in batch.rejects.index:
+        fps[pos] = fingerprint_text(batch.raw[pos])
+    return fps
+
+def batch_seen_at(batch):
+    """Epoch second of each raw row's signal (SignalDate + SignalTime), now where it did not parse."""
+    seen_at = np.full(len(batch), int(time.time()), dtype=np.int64)
+    stamps = pd.to_datetime(batch.text["SignalDate"] + " " + batch.text["SignalTime"], errors="coerce")
+    parsed = stamps.notna()
+    seen_at[stamps.index[parsed]] = (stamps[parsed] - pd.Timestamp(0)) // pd.Timedelta(seconds=1)
+    return seen_at
+
+def append_signals(batch):
+    log.info("🆕 Storing %d new signal rows", len(batch.text), extra={"rows": batch.text.values.tolist()})
+    get_signal_store().append_signals(batch.text.values.tolist())
+
+def append_source_rows(data_rows):
+    get_signal_store().append_source(data_rows)
+
+def detect_new_rows(img, captured_at=None):
+    """
+    Run one frame through change detection, layout detection, OCR, parsing and dedup.
+    Only the data rows overlapping the band that changed since the last committed
+    frame are OCR'd. The frame is committed once its band has been parsed and
+    deduped; after an error it is not, so the band is read again next time.
+    Returns a ParsedBatch of the rows that were not seen before; persisting it
+    (persist_rows, which also records them as seen) is up to the caller.
+    captured_at (perf_counter of the grab) starts each new signal's latency trace.
+    """
+    with timer("ocr.frame_diff"):
+        band = frame_diff.dirty_band(img)
+    if band is None:
+        log.info("💤 Table unchanged, skipping OCR", extra={"rate_key": "ocr.unchanged"})
+        return parse_rows([])
+    with timer("ocr.extract_table") as t:
+        table_rows = extract_table(img)
+    last_timings['extract'] = t.elapsed
+
+    # Data rows by geometry: the window and table frames (if captured) enclose them
+    y0, y1 = band
+    _, data_rows = split_frames(table_rows)
+    dirty_rows = [r for r in data_rows if r[:, 1].min() < y1 and (r[:, 1] + r[:, 3]).max() > y0]
+    last_timings['dirty_rows'] = len(dirty_rows)
+    if not dirty_rows:
+        frame_diff.commit()
+        return parse_rows([])
+    with timer("ocr.ocr_table"):
+        table_data = ocr_table(img, dirty_rows, cache=row_cache)
+    row_cache.save()
+    log.debug("OCR rows %d-%d: %s", y0, y1, table_data)
+    with timer("ocr.parse_rows"):
+        batch = parse_rows(table_data)
+
+    # Filter out rows already seen (by date, time and symbol, so a misread price is not a new signal)
+    index = get_dedup_index()
+    new_rows = batch.select(index.claim(batch_fingerprints(batch), batch_seen_at(batch)))
+    log.debug("OCR rows: %d read, %d new, dedup %s", len(batch), len(new_rows), index.stats())
+    for line, why in zip(new_rows.rejects["Line"], new_rows.rejects["Reason"]):
+        log.warning("⚠️ Rejected OCR row (%s): %s", why, line, extra={"rate_key": f"ocr.reject.{why}"})
+    for key in new_rows.keys():
+        if captured_at is not None:
+            trace_mark(key, "captured", captured_at)
+        trace_mark(key, "ocr")
+    # Rejected rows too: the row cache would read the same strip the same way again
+    frame_diff.commit()
+    return new_rows
+
+def persist_rows(batch):
+    """Store the batch, then record its fingerprints; on failure they are released to be read again."""
+    fps = batch_fingerprints(batch)
+    try:
+        with timer("ocr.store") as t:
+            if len(batch.text):
+                append_signals(batch)
+            append_source_rows(batch.raw)
+    except Exception:
+        get_dedup_index().release(fps)
+        raise
+    get_dedup_index().record(fps, batch_seen_at(batch))
+    last_timings['store'] = t.elapsed
+
+def process_frame(img, captured_at=None):
+    """detect_new_rows + persist_rows. Returns the ParsedBatch of new rows."""
+    new_rows = detect_new_rows(img, captured_at)
+    if new_rows:
+        persist_rows(new_rows)
+    return new_rows
+
+def main():
+    parser = argparse.ArgumentParser(description="Watch the Triggers List window and OCR new rows into the signal store.")
+    parser.add_argument("--replay", help="directory (or single image) of saved screenshots to replay instead of the screen")
+    parser.add_argument("--loop", action="store_true", help="keep replaying the screenshots")
+    parser.add_argument("--debug-dump", action="store_true", help="save every captured frame to table.png")
+    args = parser.parse_args()
+
+    setup_logging()
+    init_store()
+    start_export()
+    if args.replay:
+        source = ReplaySource(args.replay, loop=args.loop)
+        interval = 0  # replay as fast as the pipeline allows
+    else:
+        source = ScreenSource(debug_dump=args.debug_dump or OCR_DEBUG_DUMP, dump_path=image_path)
+        interval = OCR_POLL_INTERVAL
+
+    print("🔍 Watching for table updates... Press Ctrl+C to stop.")
+    try:
+        while True:
+            last_timings.clear()
+            cycle_start = time.perf_counter()
+            img = source.grab()
+            if img is None:
+                log.info("✅ Replay finished.")
+                break
+            last_timings['capture'] = time.perf_counter() - cycle_start
+            observe("ocr.capture", last_timings['capture'])
+
+            process_frame(img, cycle_start)
+
+            last_timings['cycle'] = time.perf_counter() - cycle_start
+            observe("ocr.cycle", last_timings['cycle'])
+            log.info(
+                "⏱️ %s", " | ".join(f"{k}={v:.3f}s" if isinstance(v, float) else f"{k}={v}" for k, v in last_timings.items()),
+                extra={"timings": dict(last_timings), "rate_key": "ocr.timings"},
+            )
+            log.debug("🗂️ Row cache: %s", row_cache.stats())
+
+            time.sleep(interval)
+
+    except KeyboardInterrupt:
+        print("\n🛑 Stopped by user.")
+    finally:
+        cv2.destroyAllWindows()
 
-            header = table_data[1]
-            print(header, "222222")
-            data_rows = table_data[2:]
-            print(data_rows, "333333")
-            
-            # Filter out rows already in Excel
-            new_rows = []
-            print(new_rows, "444444")
-            print(previous_rows, "555555")
-            for r in data_rows:
-                row_tuple = tuple(r)
-                if row_tuple not in previous_rows:
-                    previous_rows.add(row_tuple)
-                    new_rows.append(r)
-            print(new_rows, "666666")
-
-            if new_rows:
-                append_to_excel(header, new_rows)
-                append_to_source_excel(header, new_rows)
-            #     img = highlight_new_rows(img, table_rows[1:], new_rows)
-            #     print(img, "777777")
-
-            # cv2.imshow("OCR Table Monitor", img)
-            # if cv2.waitKey(1) & 0xFF == 27:
-            #     break
-
-        time.sleep(5)
-
-except KeyboardInterrupt:
-    print("\n🛑 Stopped by user.")
-finally:
-    cv2.destroyAllWindows()
\ No newline at end of file
+if __name__ == "__main__":
+    main()
@@ -1,63 +1,223 @@
+import logging
+import time
 from ib_insync import Stock,Forex,LimitOrder,StopOrder,Order
+from metrics import timer
+from order_book import book_symbol
 
-def place_limit_order(ib, symbol, asset_type, qty, price, action):
+log = logging.getLogger(__name__)
+
+def make_contract(symbol, asset_type):
     """
     asset_type: 'Stock' or 'Forex'
-    action: 'BUY' or 'SELL'
     """
     if asset_type == "Stock":
-        contract = Stock(symbol, 'SMART', 'USD')
+        return Stock(symbol, 'SMART', 'USD')
     elif asset_type == "Forex":
         base, quote = symbol[:3], symbol[-3:]
-        print(f"{base}{quote}")
-        contract = Forex(f"{base}{quote}")
-    else:
-        print(f"❌ Unknown asset type for {symbol}")
+        return Forex(f"{base}{quote}")
+    log.error("❌ Unknown asset type for %s", symbol)
+    return None
+
+class ContractCache:
+    """Contracts keyed by (symbol, asset_type), each qualified with IB once per session."""
+
+    def __init__(self):
+        self.contracts = {}
+
+    def prefetch(self, ib, keys):
+        """Qualify every uncached (symbol, asset_type) in a single qualifyContracts call."""
+        pending = {}
+        for symbol, asset_type in keys:
+            if (symbol, asset_type) in self.contracts:
+                continue
+            contract = make_contract(symbol, asset_type)
+            if contract is not None:
+                pending[(symbol, asset_type)] = contract
+        if pending:
+            with timer("order.qualify_contracts"):
+                ib.qualifyContracts(*pending.values())
+            self.contracts.update(pending)
+
+    def get(self, ib, symbol, asset_type):
+        if (symbol, asset_type) not in self.contracts:
+            self.prefetch(ib, [(symbol, asset_type)])
+        return self.contracts.get((symbol, asset_type))
+
+contract_cache = ContractCache()
+
+def limit_order(qty, price, action):
+    return LimitOrder(action, qty, price)
+
+def trailing_stop_order(qty, trail_amount, action):
+    sl_action = 'SELL' if action == 'BUY' else 'BUY'
+    order = Order()
+    order.action = sl_action
+    order.totalQuantity = qty
+    order.orderType = 'TRAIL'
+    order.trailingAmount = trail_amount
+    order.tif = 'GTC'  # Good till canceled
+    return order
+
+def pyramid_requests(symbol, asset_type, qty, prices, action):
+    """One (symbol, asset_type, LimitOrder) request per pyramid price."""
+    return [(symbol, asset_type, limit_order(qty, price, action)) for price in prices]
+
+class OrderGroup:
+    """
+    The linked orders sent for one signal. The first pyramid entry is the parent;
+    the remaining entries and the protective trailing stop are its children.
+    """
+
+    def __init__(self, group_id, symbol):
+        self.group_id = group_id
+        self.symbol = symbol
+        self.trades = []
+
+    def done(self):
+        """True once every order of the group is filled or cancelled."""
+        return all(t.isDone() for t in self.trades)
+
+    def cancel(self, ib):
+        """
+        One cancel for the parent while it is working (TWS cancels the children);
+        once it has filled, the children are independent and are cancelled each.
+        Returns the number of cancel messages sent.
+        """
+        if not self.trades:
+            return 0
+        parent = self.trades[0]
+        if not parent.isDone():
+            ib.cancelOrder(parent.order)
+            return 1
+        live = [t for t in self.trades[1:] if not t.isDone()]
+        for t in live:
+            ib.cancelOrder(t.order)
+        return len(live)
+
+# symbol -> OrderGroups sent this session that may still have working orders
+order_groups = {}
+
+def signal_group_requests(ib, symbol, asset_type, qty, prices, action, trail_amount=None):
+    """
+    Build a signal's pyramid entries and trailing stop as one parent/child group.
+    Every order carries the group id as orderRef and all but the last have
+    transmit=False, so TWS releases the whole group together when the last
+    one arrives. Returns (OrderGroup, requests); pass the requests to
+    submit_orders and the resulting trades to register_group.
+    """
+    orders = [limit_order(qty, price, action) for price in prices]
+    if trail_amount is not None:
+        orders.append(trailing_stop_order(qty, trail_amount, action))
+    if not orders:
+        return None, []
+
+    parent = orders[0]
+    parent.orderId = ib.client.getReqId()
+    group = OrderGroup(f"sig-{symbol}-{parent.orderId}", symbol)
+    for order in orders:
+        order.orderRef = group.group_id
+        order.transmit = False
+        if order is not parent:
+            order.parentId = parent.orderId
+    orders[-1].transmit = True
+    return group, [(symbol, asset_type, order) for order in orders]
+
+def register_group(group, trades):
+    """Track the group's trades; finished groups are dropped on the way."""
+    group.trades = [t for t in trades if t is not None]
+    for symbol in list(order_groups):
+        live = [g for g in order_groups[symbol] if not g.done()]
+        if live:
+            order_groups[symbol] = live
+        else:
+            del order_groups[symbol]
+    order_groups.setdefault(group.symbol, []).append(group)
+
+@timer("order.cancel_groups")
+def cancel_symbol_groups(ib, symbol):
+    """Cancel every order group sent for symbol. Returns False if no cancel was sent (none were working)."""
+    groups = [g for g in order_groups.pop(symbol, []) if not g.done()]
+    sent = sum(group.cancel(ib) for group in groups)
+    if sent:
+        log.info("🛑 Canceled %d order groups for %s (%d cancel messages)", len(groups), symbol, sent,
+                 extra={"symbol": symbol, "groups": len(groups), "cancels": sent})
+    return sent > 0
+
+@timer("order.submit")
+def submit_orders(ib, requests):
+    """
+    Send a batch of (symbol, asset_type, order) requests.
+    Contracts are qualified once through the shared cache, then every order goes
+    on the wire without waiting for acks. Returns the Trade handles in request
+    order (None where the contract could not be built); see wait_for_fills.
+    """
+    requests = list(requests)
+    contract_cache.prefetch(ib, {(symbol, asset_type) for symbol, asset_type, _ in requests})
+    trades = []
+    for symbol, asset_type, order in requests:
+        contract = contract_cache.get(ib, symbol, asset_type)
+        trades.append(ib.placeOrder(contract, order) if contract is not None else None)
+    if requests:
+        symbols = {symbol for symbol, _, _ in requests}
+        log.info("📤 Submitted %d orders for %d symbols", len(requests), len(symbols),
+                 extra={"orders": len(requests), "symbols": sorted(symbols)})
+    return trades
+
+@timer("order.wait_for_fills")
+def wait_for_fills(ib, trades, timeout=30):
+    """Block (while processing IB events) until every trade is done or timeout. Returns the filled trades."""
+    trades = [t for t in trades if t is not None]
+    deadline = time.monotonic() + timeout
+    while any(not t.isDone() for t in trades):
+        remaining = deadline - time.monotonic()
+        if remaining <= 0 or not ib.waitOnUpdate(timeout=remaining):
+            break
+    return [t for t in trades if t.orderStatus.status == 'Filled']
+
+def place_limit_order(ib, symbol, asset_type, qty, price, action):
+    """
+    asset_type: 'Stock' or 'Forex'
+    action: 'BUY' or 'SELL'
+    """
+    contract = contract_cache.get(ib, symbol, asset_type)
+    if contract is None:
         return None
 
-    order = LimitOrder(action, qty, price)
+    order = limit_order(qty, price, action)
     trade = ib.placeOrder(contract, order)
-    print(f"📤 Placed {action} {qty} {symbol} @ {price}")
+    log.info("📤 Placed %s %s %s @ %s", action, qty, symbol, price,
+             extra={"symbol": symbol, "action": action, "qty": qty, "price": price})
     return trade
 
 def place_stop_loss(ib, symbol, asset_type, qty, stop_price, action):
-    if asset_type == "Stock":
-        contract = Stock(symbol, 'SMART', 'USD')
-    elif asset_type == "Forex":
-        base, quote = symbol[:3], symbol[-3:]
-        contract = Forex(f"{base}{quote}")
-    else:
+    contract = contract_cache.get(ib, symbol, asset_type)
+    if contract is None:
         return None
 
     sl_action = 'SELL' if action == 'BUY' else 'BUY'
     order = StopOrder(sl_action, qty, stop_price)
     trade = ib.placeOrder(contract, order)
-    print(f"📉 Stop Loss set for {symbol} @ {stop_price}")
+    log.info("📉 Stop Loss set for %s @ %s", symbol, stop_price, extra={"symbol": symbol, "stop_price": stop_price})
     return trade
     
 def place_trailing_stop(ib, symbol, asset_type, qty, trail_amount, action):
-    if asset_type == "Stock":
-        contract = Stock(symbol, 'SMART', 'USD')
-    elif asset_type == "Forex":
-        base, quote = symbol[:3], symbol[-3:]
-        contract = Forex(f"{base}{quote}")
-    else:
+    contract = contract_cache.get(ib, symbol, asset_type)
+    if contract is None:
         return None
 
-    sl_action = 'SELL' if action == 'BUY' else 'BUY'
-    order = Order()
-    order.action = sl_action
-    order.totalQuantity = qty
-    order.orderType = 'TRAIL'
-    order.trailingAmount = trail_amount
-    order.tif = 'GTC'  # Good till canceled
+    order = trailing_stop_order(qty, trail_amount, action)
     trade = ib.placeOrder(contract, order)
-    print(f"📉 Trailing Stop set for {symbol}, trail {trail_amount}")
+    log.info("📉 Trailing Stop set for %s, trail %s", symbol, trail_amount,
+             extra={"symbol": symbol, "trail_amount": trail_amount})
     return trade
 
-def cancel_all_orders_for_symbol(ib, symbol):
-    open_trades = ib.trades()
+@timer("order.cancel_symbol")
+def cancel_all_orders_for_symbol(ib, symbol, book=None):
+    """Cancel the symbol's working orders; with an OrderBook only its live orders are visited."""
+    if book is not None:
+        open_trades = book.orders(symbol)
+    else:
+        open_trades = [t for t in ib.openTrades() if book_symbol(t.contract) == symbol]
     for t in open_trades:
-        if t.contract.symbol == symbol:
-            ib.cancelOrder(t.order)
-            print(f"🛑 Canceled order {t.order.orderId} for {symbol}")
\ No newline at end of file
+        ib.cancelOrder(t.order)
+        log.info("🛑 Canceled order %s for %s", t.order.orderId, symbol, extra={"symbol": symbol, "order_id": t.order.orderId})
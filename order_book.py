@@ -0,0 +1,94 @@
+import math
+from collections import defaultdict
+
+# Order types that close a position (protective stops) rather than open one
+STOP_ORDER_TYPES = {"STP", "STP LMT", "TRAIL", "TRAIL LIMIT"}
+
+
+def book_symbol(contract):
+    """Our symbol naming: 'EUR.USD' for forex pairs, the plain symbol otherwise."""
+    if contract.secType == "CASH":
+        return f"{contract.symbol}.{contract.currency}"
+    return contract.symbol
+
+
+class OrderBook:
+    """
+    Working orders indexed by symbol, kept current from ib_insync's
+    newOrderEvent / openOrderEvent / orderStatusEvent. Filled and cancelled
+    orders drop out, so lookups cost O(live orders for the symbol). One book
+    can follow several connections (an IBPool's order client ids); order ids
+    are only unique per connection, so entries are keyed by (connection, id).
+    """
+
+    def __init__(self, ib=None):
+        self.live = defaultdict(dict)  # symbol -> {order key: Trade}
+        if ib is not None:
+            self.attach(ib)
+
+    def attach(self, ib):
+        on_trade = lambda trade: self.on_trade(trade, source=id(ib))
+        ib.newOrderEvent += on_trade
+        ib.openOrderEvent += on_trade
+        ib.orderStatusEvent += on_trade
+        for trade in ib.openTrades():
+            on_trade(trade)
+        return self
+
+    def on_trade(self, trade, source=None):
+        symbol = book_symbol(trade.contract)
+        # Orders from other clients / TWS can carry orderId 0; permId identifies those
+        key = (source, trade.order.orderId or trade.order.permId)
+        orders = self.live[symbol]
+        if trade.isActive():
+            orders[key] = trade
+        else:
+            orders.pop(key, None)
+            if not orders:
+                del self.live[symbol]
+
+    def orders(self, symbol):
+        return list(self.live.get(symbol, {}).values())
+
+    def exposure(self, symbol):
+        """Signed remaining quantity of the symbol's working orders (BUY +, SELL -)."""
+        total = 0.0
+        for t in self.live.get(symbol, {}).values():
+            sign = 1 if t.order.action == "BUY" else -1
+            total += sign * t.remaining()
+        return total
+
+    def entry_quantities(self, symbol):
+        """(BUY, SELL) remaining quantity of the symbol's working entry orders; stops are left out."""
+        buy = sell = 0.0
+        for t in self.live.get(symbol, {}).values():
+            if t.order.orderType in STOP_ORDER_TYPES:
+                continue
+            if t.order.action == "BUY":
+                buy += t.remaining()
+            else:
+                sell += t.remaining()
+        return buy, sell
+
+    def has_working_order(self, symbol, action, price, tolerance=1e-9):
+        """True if a working order on the same side already sits at this limit price."""
+        for t in self.live.get(symbol, {}).values():
+            if t.order.action == action and math.isclose(t.order.lmtPrice, price, abs_tol=tolerance):
+                return True
+        return False
+
+    def snapshot(self):
+        """{symbol: {"orders": n, "exposure": qty}} for monitoring."""
+        return {s: {"orders": len(o), "exposure": self.exposure(s)} for s, o in self.live.items()}
+
+
+order_book = None
+
+def get_order_book(ib):
+    """The session's order book, attached on first use to ib (every order connection of an IBPool)."""
+    global order_book
+    if order_book is None:
+        order_book = OrderBook()
+        for conn in ib.order_ibs() if hasattr(ib, "order_ibs") else [ib]:
+            order_book.attach(conn)
+    return order_book
@@ -0,0 +1,143 @@
+"""
+Single-process OCR -> orders pipeline on one asyncio loop:
+
+    capture/OCR (executor thread) --rows--> trading (SD, pyramid, orders)
+                                  `--rows--> writer  (signal store, off the critical path)
+
+New trigger rows go straight from OCR into order placement; nothing waits on a
+polling sleep or an Excel round-trip. The CPU-heavy steps (OCR, signal math)
+run in executor threads so market data and order events keep flowing, and each
+loop logs and carries on after an error instead of ending the pipeline.
+"""
+import argparse
+import asyncio
+import logging
+import time
+
+from ib_insync import util
+
+import ibkr
+import ocr
+from capture import ReplaySource, ScreenSource
+from config import (
+    IB_ORDER_RETRY_ATTEMPTS, IB_SIMULATE, IB_STREAM_TRAILING_STOPS, OCR_DEBUG_DUMP, OCR_ERROR_BACKOFF,
+    OCR_MAX_ERROR_BACKOFF, OCR_POLL_INTERVAL,
+)
+from ib_pool import IBPool, backoff_delays
+from log_setup import setup_logging
+from market_data import TrailingStopManager
+from metrics import start_export
+from sim_broker import SimulatedIB
+
+log = logging.getLogger(__name__)
+
+
+async def capture_loop(source, order_queue, write_queue, interval):
+    loop = asyncio.get_running_loop()
+    backoff = OCR_ERROR_BACKOFF
+    try:
+        while True:
+            started = time.perf_counter()
+            try:
+                frame = await loop.run_in_executor(None, source.grab)
+                if frame is None:
+                    print("✅ Capture source exhausted.")
+                    return
+                new_rows = await loop.run_in_executor(None, ocr.detect_new_rows, frame, started)
+            except Exception as e:
+                # Missing window, bad frame, OCR failure: keep trading, retry the capture later
+                log.error("❌ Capture failed, retrying in %.0fs: %s", backoff, e, exc_info=True,
+                          extra={"rate_key": "pipeline.capture_error"})
+                await asyncio.sleep(backoff)
+                backoff = min(OCR_MAX_ERROR_BACKOFF, backoff * 2)
+                continue
+            backoff = OCR_ERROR_BACKOFF
+            if new_rows:
+                order_queue.put_nowait((started, new_rows, 0))
+                write_queue.put_nowait(new_rows)
+            await asyncio.sleep(max(0.0, interval - (time.perf_counter() - started)))
+    finally:
+        order_queue.put_nowait(None)
+        write_queue.put_nowait(None)
+
+async def trading_loop(ib, order_queue):
+    loop = asyncio.get_running_loop()
+    retry_delays = backoff_delays(IB_ORDER_RETRY_ATTEMPTS)
+    while True:
+        item = await order_queue.get()
+        if item is None:
+            return
+        started, batch, attempt = item
+        if batch.signals.empty:
+            continue
+        try:
+            account = ibkr.account_snapshot(ib)
+            sd_df = await loop.run_in_executor(None, ibkr.prepare_signals, batch.signals.copy(), account)
+            # Orders go out on the loop thread: ib_insync is not thread-safe
+            processed = ibkr.place_signals(ib, sd_df) if not sd_df.empty else 0
+            log.info("⚡ %d signals on the wire %.3fs after capture", processed, time.perf_counter() - started)
+        except Exception as e:
+            # The batch's claims are marked failed, so a retry can claim them again
+            if attempt < len(retry_delays):
+                delay = retry_delays[attempt]
+                log.error("❌ Error handling OCR rows, retrying in %.0fs: %s", delay, e, exc_info=True)
+                loop.call_later(delay, order_queue.put_nowait, (started, batch, attempt + 1))
+            else:
+                log.error("❌ Error handling OCR rows, giving up after %d attempts: %s", attempt + 1, e,
+                          exc_info=True, extra={"keys": batch.keys().tolist()})
+
+async def writer_loop(write_queue):
+    loop = asyncio.get_running_loop()
+    while True:
+        batch = await write_queue.get()
+        if batch is None:
+            return
+        try:
+            await loop.run_in_executor(None, ocr.persist_rows, batch)
+        except Exception as e:
+            log.error("❌ Error persisting OCR rows: %s", e, exc_info=True)
+
+async def run_pipeline(source, interval):
+    # Lets the synchronous ib_insync helpers (qualifyContracts, ...) run inside this loop
+    util.patchAsyncio()
+    if IB_SIMULATE:
+        ib = IBPool.wrap(await SimulatedIB().connectAsync())
+        log.warning("🧪 IB_SIMULATE is on: orders go to the simulated broker, NOT to TWS / IB Gateway")
+    else:
+        ib = await IBPool().connect_async(("market_data", "orders"))
+    print("✅ Connected to IBKR")
+    if IB_STREAM_TRAILING_STOPS:
+        TrailingStopManager(ib).start()
+    ocr.init_store()
+    start_export()
+
+    order_queue = asyncio.Queue()
+    write_queue = asyncio.Queue()
+    try:
+        await asyncio.gather(
+            capture_loop(source, order_queue, write_queue, interval),
+            trading_loop(ib, order_queue),
+            writer_loop(write_queue),
+        )
+    finally:
+        ib.disconnect()
+        print("🔌 Disconnected from IBKR")
+
+def main():
+    parser = argparse.ArgumentParser(description="Event-driven OCR to order pipeline.")
+    parser.add_argument("--replay", help="directory (or single image) of saved screenshots to replay")
+    parser.add_argument("--interval", type=float, default=OCR_POLL_INTERVAL, help="seconds between captures")
+    args = parser.parse_args()
+
+    setup_logging()
+    if args.replay:
+        source = ReplaySource(args.replay)
+    else:
+        source = ScreenSource(debug_dump=OCR_DEBUG_DUMP, dump_path=ocr.image_path)
+    try:
+        asyncio.run(run_pipeline(source, args.interval))
+    except KeyboardInterrupt:
+        print("\n🛑 Stopped by user.")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,115 @@
+"""
+Offline replay/backtest of the trading path against SimulatedIB:
+signal rows -> handle_signals (clean, size, place orders) -> price series
+-> fills, P&L and per-stage timings. No TWS, no sleeps.
+"""
+import argparse
+import time
+from collections import defaultdict
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+import ibkr
+from order_book import OrderBook
+import order_book
+from row_parser import parse_rows
+from signal_store import SignalLedger, set_signal_ledger
+from sim_broker import SimulatedIB
+import sizing
+from sizing import AccountState
+
+
+def load_signals(path):
+    """Signal rows from results.xlsx-style sheets, or raw OCR rows from previous_source.xlsx."""
+    df = pd.read_excel(path, header=None, dtype=str)
+    if "SignalDate" in df.iloc[0].tolist():
+        df.columns = df.iloc[0]
+        return df.iloc[1:].reset_index(drop=True)
+    return parse_rows([[text] for text in df[0].dropna()]).text.reset_index(drop=True)
+
+def load_prices(path):
+    """CSV with Time, Symbol, Price columns."""
+    prices = pd.read_csv(path, parse_dates=["Time"])
+    return prices.sort_values("Time")
+
+def synthetic_prices(signals, steps=200, volatility=2e-4, seed=0):
+    """Random walk for every signalled symbol, starting at its first LastPrice, after the last signal."""
+    rng = np.random.default_rng(seed)
+    start = pd.to_datetime(signals["SignalDate"] + " " + signals["SignalTime"], errors="coerce").max()
+    start = start if not pd.isna(start) else pd.Timestamp.now()
+    frames = []
+    for symbol, group in signals.groupby("Symbol"):
+        first = pd.to_numeric(group["LastPrice"], errors="coerce").dropna()
+        if first.empty:
+            continue
+        path = first.iloc[0] * np.exp(np.cumsum(rng.normal(0, volatility, steps)))
+        frames.append(pd.DataFrame({
+            "Time": start + pd.to_timedelta(np.arange(1, steps + 1), unit="s"),
+            "Symbol": symbol,
+            "Price": path,
+        }))
+    return pd.concat(frames).sort_values("Time") if frames else pd.DataFrame(columns=["Time", "Symbol", "Price"])
+
+def run_replay(signals, prices, batch_by="SignalTime"):
+    """Replay signal batches (one per distinct timestamp) then the price series. Returns (sim, timings)."""
+    sim = SimulatedIB().connect()
+    # Keep the replay away from the live ledger and order book
+    set_signal_ledger(SignalLedger(":memory:"))
+    order_book.order_book = OrderBook(sim)
+    sizing.account_state = AccountState(sim)
+
+    timings = defaultdict(list)
+    signals = signals.sort_values(["SignalDate", "SignalTime"], kind="stable")
+    for _, batch in signals.groupby(["SignalDate", batch_by], sort=False):
+        for symbol, price in zip(batch["Symbol"], pd.to_numeric(batch["LastPrice"], errors="coerce")):
+            if not pd.isna(price):
+                sim.set_price(symbol, price)
+        t = time.perf_counter()
+        ibkr.handle_signals(sim, batch.copy())
+        timings["handle_signals"].append(time.perf_counter() - t)
+
+    t = time.perf_counter()
+    for ts, symbol, price in zip(prices["Time"], prices["Symbol"], prices["Price"]):
+        sim.set_price(symbol, float(price), time=ts.to_pydatetime())
+    timings["price_replay"].append(time.perf_counter() - t)
+    return sim, timings
+
+def report(sim, timings, signals):
+    print(f"📊 Replayed {len(signals)} signal rows, {len(sim.trades())} orders, {len(sim.fills)} fills")
+    for stage, values in timings.items():
+        values = np.array(values)
+        print(f"  {stage:<16} calls={len(values):<6} total={values.sum():8.4f}s  mean={values.mean() * 1000:8.3f}ms")
+    total_realized = total_unrealized = 0.0
+    for symbol, (realized, unrealized) in sorted(sim.pnl().items()):
+        total_realized += realized
+        total_unrealized += unrealized
+        print(f"  {symbol:<10} pos={sim.position[symbol]:>12,.2f}  realized={realized:>12,.2f}  unrealized={unrealized:>12,.2f}")
+    print(f"  TOTAL      realized={total_realized:,.2f}  unrealized={total_unrealized:,.2f}")
+
+def main():
+    parser = argparse.ArgumentParser(description="Replay captured signals through the trading path against a simulated broker.")
+    parser.add_argument("signals", nargs="?", default="previous_source.xlsx", help="results.xlsx-style sheet or previous_source.xlsx")
+    parser.add_argument("--prices", help="CSV with Time, Symbol, Price (default: synthetic random walk)")
+    parser.add_argument("--repeat", type=int, default=1, help="replay the signals N times (load test)")
+    args = parser.parse_args()
+
+    signals = load_signals(args.signals)
+    if args.repeat > 1:
+        # Shift the date on each copy so every repetition is a distinct signal
+        copies = []
+        for i in range(args.repeat):
+            copy = signals.copy()
+            copy["SignalDate"] = copy["SignalDate"] + f"#{i}"
+            copies.append(copy)
+        signals = pd.concat(copies, ignore_index=True)
+    prices = load_prices(args.prices) if args.prices else synthetic_prices(signals)
+
+    started = datetime.now()
+    sim, timings = run_replay(signals, prices)
+    report(sim, timings, signals)
+    print(f"⏱️ Wall time {(datetime.now() - started).total_seconds():.3f}s")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,85 @@
+import hashlib
+import json
+import os
+from collections import OrderedDict
+
+import cv2
+import numpy as np
+
+
+def binarize(image):
+    """Grayscale + the same fixed threshold the OCR step uses (text becomes 255)."""
+    gray = image if image.ndim == 2 else cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
+    _, thresh = cv2.threshold(gray, 200, 255, cv2.THRESH_BINARY_INV)
+    return thresh
+
+def strip_hash(thresh):
+    """
+    Hash of a binarized image strip.
+    Thresholding first makes the key insensitive to anti-aliasing and colour noise,
+    while a single changed digit still changes the key.
+    """
+    bits = np.packbits(thresh > 0)
+    h = hashlib.blake2b(digest_size=16)
+    h.update(np.asarray(thresh.shape, dtype=np.int32).tobytes())
+    h.update(bits.tobytes())
+    return h.hexdigest()
+
+
+class RowHashCache:
+    """
+    Bounded LRU of row-strip hash -> OCR'd row texts, persisted as JSON
+    next to the previous source workbook.
+    """
+
+    def __init__(self, path, max_size=512):
+        self.path = path
+        self.max_size = max_size
+        self.entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.dirty = False
+
+    def get(self, key):
+        texts = self.entries.get(key)
+        if texts is None:
+            self.misses += 1
+            return None
+        self.entries.move_to_end(key)
+        self.hits += 1
+        return texts
+
+    def put(self, key, texts):
+        self.entries[key] = list(texts)
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.max_size:
+            self.entries.popitem(last=False)
+        self.dirty = True
+
+    def stats(self):
+        total = self.hits + self.misses
+        return {
+            "size": len(self.entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / total if total else 0.0,
+        }
+
+    def load(self):
+        if not os.path.exists(self.path):
+            return self
+        with open(self.path, encoding="utf-8") as f:
+            for key, texts in json.load(f):
+                self.entries[key] = texts
+        while len(self.entries) > self.max_size:
+            self.entries.popitem(last=False)
+        return self
+
+    def save(self):
+        if not self.dirty:
+            return
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(list(self.entries.items()), f)
+        os.replace(tmp_path, self.path)
+        self.dirty = False
@@ -0,0 +1,122 @@
+"""
+OCR rows -> typed signal batch in one vectorized pass.
+
+Each raw row's first cell holds the whole table line, e.g.
+    2025-08-13 08:13:21 AUD.CHF LongTrigger 0.52635 0.52645 0.52640 0.52663 -2.016 0.070
+One precompiled pattern splits every line of the frame into the signal columns;
+each column then gets its own confusion map and validation, symbols are
+resolved against the tick_size.xlsx universe, and rows that fail any check go
+to ParsedBatch.rejects with a reason instead of raising.
+"""
+import re
+
+import numpy as np
+import pandas as pd
+
+from symbol_ref import get_symbol_cache
+
+NUMERIC_COLUMNS = ["BidPrice", "AskPrice", "LastPrice", "EqPrice", "EqLevel", "Bias"]
+
+# Date and time may come glued together ('2025-08-0723:45:00'); extra trailing fields are ignored
+ROW_PATTERN = re.compile(
+    r"^\s*(?P<SignalDate>\S{10})\s*(?P<SignalTime>\S{8})\s+(?P<Symbol>\S+)\s+(?P<Signal>\S+)"
+    + "".join(rf"\s+(?P<{column}>\S+)" for column in NUMERIC_COLUMNS)
+)
+DATE_PATTERN = re.compile(r"^\d{4}-\d{2}-\d{2}$")
+TIME_PATTERN = re.compile(r"^\d{2}:\d{2}:\d{2}$")
+
+# Per-column confusion maps for what Tesseract reads in this table's font
+DATETIME_CONFUSIONS = str.maketrans({"O": "0", "o": "0", "D": "0", "l": "1", "I": "1", "|": "1", "S": "5", "B": "8"})
+NUMERIC_CONFUSIONS = str.maketrans({"o": "9", "O": "0", "l": "1", "I": "1", "|": "1", ",": "."})
+SYMBOL_CONFUSIONS = str.maketrans({"0": "O", "1": "I", "5": "S", "8": "B"})
+SIGNAL_CONFUSIONS = str.maketrans({"1": "l", "0": "o", "|": "l"})
+SIGNALS = {"longtrigger": "LongTrigger", "shorttrigger": "ShortTrigger"}
+
+
+class ParsedBatch:
+    """
+    One frame's OCR rows after parsing, all indexed by the row's position in raw:
+    signals  typed columns (float64 prices) of the rows that parsed
+    text     the same rows as repaired text, which is what the signal store keeps
+    rejects  Line and Reason of the rows that did not
+    """
+
+    __slots__ = ("raw", "signals", "text", "rejects")
+
+    def __init__(self, raw, signals, text, rejects):
+        self.raw = raw
+        self.signals = signals
+        self.text = text
+        self.rejects = rejects
+
+    def __len__(self):
+        return len(self.raw)
+
+    def select(self, flags):
+        """The batch restricted to the rows whose flag is true (positions are renumbered)."""
+        keep = [i for i, flag in enumerate(flags) if flag]
+        renumber = {old: new for new, old in enumerate(keep)}
+        pick = lambda df: df[df.index.isin(keep)].rename(index=renumber)
+        return ParsedBatch([self.raw[i] for i in keep], pick(self.signals), pick(self.text), pick(self.rejects))
+
+    def keys(self):
+        """UniqueKey (SignalDate_SignalTime_Symbol) of each parsed row, as ibkr.signal_keys builds it."""
+        return self.text["SignalDate"] + "_" + self.text["SignalTime"] + "_" + self.text["Symbol"]
+
+
+_universe = (None, None)
+
+def symbol_universe():
+    """Letters-only uppercase name -> sheet Symbol ('EURUSD' -> 'EUR.USD'), or None without a sheet."""
+    global _universe
+    try:
+        config = get_symbol_cache().config()
+    except FileNotFoundError:
+        return None
+    if _universe[0] is not config:
+        _universe = (config, {re.sub(r"[^A-Z]", "", symbol.upper()): symbol for symbol in config})
+    return _universe[1]
+
+def _resolve_symbols(letters):
+    universe = symbol_universe()
+    if universe is None:
+        # No reference sheet: six letters is a currency pair, anything else a stock ticker
+        return letters.where(letters.str.len() != 6, letters.str[:3] + "." + letters.str[3:])
+    return letters.map(universe)
+
+def parse_rows(rows):
+    """Parse a frame's raw OCR rows (lists of cell texts) into a ParsedBatch."""
+    raw = [list(r) for r in rows]
+    lines = pd.Series([str(r[0]) if r and r[0] is not None else "" for r in raw], dtype=object)
+    fields = lines.str.extract(ROW_PATTERN)
+    # First failing check per row; columns are collected as Series and framed once at the end
+    reason = np.where(fields["SignalDate"].isna().to_numpy(), "too few fields", None)
+
+    def reject(bad, why):
+        reason[np.asarray(bad, dtype=bool) & pd.isna(reason)] = why
+
+    text = {}
+    text["SignalDate"] = fields["SignalDate"].str.translate(DATETIME_CONFUSIONS)
+    reject(~text["SignalDate"].str.match(DATE_PATTERN, na=False), "bad date")
+    text["SignalTime"] = (fields["SignalTime"].str.translate(DATETIME_CONFUSIONS)
+                          .str.replace(r":(?:6\d|[7-9]\d)$", ":59", regex=True))  # seconds past 59
+    reject(~text["SignalTime"].str.match(TIME_PATTERN, na=False), "bad time")
+
+    letters = fields["Symbol"].str.upper().str.translate(SYMBOL_CONFUSIONS).str.replace(r"[^A-Z]", "", regex=True)
+    text["Symbol"] = _resolve_symbols(letters)
+    reject(text["Symbol"].isna(), "unknown symbol")
+
+    signal = fields["Signal"].str.translate(SIGNAL_CONFUSIONS).str.lower().str.replace(r"[^a-z]", "", regex=True)
+    text["Signal"] = signal.map(SIGNALS)
+    reject(text["Signal"].isna(), "unknown signal")
+
+    typed = dict(text)
+    for column in NUMERIC_COLUMNS:
+        # A leading 'o' is a misread '9.' (unless the point was read); any other 'o' a '9'
+        text[column] = fields[column].str.replace(r"^o(?!\.)", "9.", regex=True).str.translate(NUMERIC_CONFUSIONS)
+        typed[column] = pd.to_numeric(text[column], errors="coerce")
+        reject(typed[column].isna(), f"bad {column}")
+
+    ok = pd.isna(reason)
+    rejects = pd.DataFrame({"Line": lines[~ok], "Reason": reason[~ok]})
+    return ParsedBatch(raw, pd.DataFrame(typed)[ok], pd.DataFrame(text)[ok], rejects)
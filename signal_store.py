@@ -0,0 +1,256 @@
+import argparse
+import csv
+import json
+import logging
+import os
+import sqlite3
+import threading
+
+from datetime import datetime, timedelta
+
+from config import (
+    SIGNAL_CSV_DIR, SIGNAL_DB_PATH, SIGNAL_LEDGER_PATH, SIGNAL_LEDGER_PENDING_TIMEOUT, SIGNAL_STORE_BACKEND, XLSX_PATH,
+)
+
+log = logging.getLogger(__name__)
+
+SIGNAL_COLUMNS = [
+    "SignalDate", "SignalTime", "Symbol", "Signal",
+    "BidPrice", "AskPrice", "LastPrice", "EqPrice", "EqLevel", "Bias",
+]
+
+
+def _pad(row):
+    row = [None if v is None else str(v) for v in list(row)[:len(SIGNAL_COLUMNS)]]
+    return row + [None] * (len(SIGNAL_COLUMNS) - len(row))
+
+
+class SqliteSignalStore:
+    """
+    Append-only signal log in SQLite.
+    signals holds the parsed rows (indexed on SignalDate, SignalTime, Symbol),
+    source_rows the raw OCR rows used for dedup.
+    """
+
+    def __init__(self, path=SIGNAL_DB_PATH):
+        self.path = path
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        columns = ", ".join(f"{c} TEXT" for c in SIGNAL_COLUMNS)
+        self.conn.execute(f"CREATE TABLE IF NOT EXISTS signals (id INTEGER PRIMARY KEY AUTOINCREMENT, {columns})")
+        self.conn.execute("CREATE INDEX IF NOT EXISTS signals_key ON signals (SignalDate, SignalTime, Symbol)")
+        self.conn.execute("CREATE TABLE IF NOT EXISTS source_rows (id INTEGER PRIMARY KEY AUTOINCREMENT, cells TEXT)")
+        self.conn.commit()
+
+    def append_signals(self, rows):
+        placeholders = ", ".join("?" for _ in SIGNAL_COLUMNS)
+        with self.lock, self.conn:
+            self.conn.executemany(
+                f"INSERT INTO signals ({', '.join(SIGNAL_COLUMNS)}) VALUES ({placeholders})",
+                [_pad(r) for r in rows],
+            )
+
+    def append_source(self, rows):
+        with self.lock, self.conn:
+            self.conn.executemany(
+                "INSERT INTO source_rows (cells) VALUES (?)", [(json.dumps(list(r)),) for r in rows]
+            )
+
+    def source_rows(self):
+        with self.lock:
+            cur = self.conn.execute("SELECT cells FROM source_rows ORDER BY id")
+            return [tuple(json.loads(cells)) for (cells,) in cur]
+
+    def read_signals(self, after_id=0):
+        """Signals with id > after_id as a DataFrame (SignalId column + SIGNAL_COLUMNS)."""
+        import pandas as pd
+        with self.lock:
+            return pd.read_sql_query(
+                f"SELECT id AS SignalId, {', '.join(SIGNAL_COLUMNS)} FROM signals WHERE id > ? ORDER BY id",
+                self.conn, params=(after_id,),
+            )
+
+    def is_empty(self):
+        with self.lock:
+            return not any(
+                self.conn.execute(f"SELECT 1 FROM {table} LIMIT 1").fetchone()
+                for table in ("signals", "source_rows")
+            )
+
+    def close(self):
+        self.conn.close()
+
+
+class CsvSignalStore:
+    """
+    Append-only CSV log: signals.csv and source_rows.csv in one directory.
+    The SignalId of a row is its 1-based line number (header excluded).
+    """
+
+    def __init__(self, directory=SIGNAL_CSV_DIR):
+        os.makedirs(directory, exist_ok=True)
+        self.signals_path = os.path.join(directory, "signals.csv")
+        self.source_path = os.path.join(directory, "source_rows.csv")
+        self.lock = threading.Lock()
+        if not os.path.exists(self.signals_path):
+            with open(self.signals_path, "w", newline="", encoding="utf-8") as f:
+                csv.writer(f).writerow(SIGNAL_COLUMNS)
+
+    def append_signals(self, rows):
+        with self.lock, open(self.signals_path, "a", newline="", encoding="utf-8") as f:
+            csv.writer(f).writerows(_pad(r) for r in rows)
+
+    def append_source(self, rows):
+        with self.lock, open(self.source_path, "a", newline="", encoding="utf-8") as f:
+            csv.writer(f).writerows(rows)
+
+    def source_rows(self):
+        if not os.path.exists(self.source_path):
+            return []
+        with self.lock, open(self.source_path, newline="", encoding="utf-8") as f:
+            return [tuple(r) for r in csv.reader(f)]
+
+    def read_signals(self, after_id=0):
+        import pandas as pd
+        with self.lock:
+            df = pd.read_csv(self.signals_path, dtype=str, skiprows=range(1, after_id + 1))
+        df.insert(0, "SignalId", range(after_id + 1, after_id + 1 + len(df)))
+        return df
+
+    def is_empty(self):
+        with self.lock, open(self.signals_path, encoding="utf-8") as f:
+            has_signals = sum(1 for _ in zip(range(2), f)) > 1
+        return not has_signals and not self.source_rows()
+
+    def close(self):
+        pass
+
+
+class SignalLedger:
+    """
+    Persisted ingestion state for the trading loop:
+    - a high-water mark, the last SignalId read from the store
+    - the processed-signal ledger, one row per UniqueKey that led to orders
+    A signal is claimed before its orders are sent, so it is never acted on twice,
+    even across restarts. If placing its orders raises, the claim is marked
+    'failed' and can be claimed again by a later pass; a crash mid-placement
+    leaves it 'pending' until recover_stale() marks it failed.
+    """
+
+    def __init__(self, path=SIGNAL_LEDGER_PATH):
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("CREATE TABLE IF NOT EXISTS state (key TEXT PRIMARY KEY, value TEXT)")
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS processed "
+            "(UniqueKey TEXT PRIMARY KEY, SignalId INTEGER, status TEXT, claimed_at TEXT, done_at TEXT)"
+        )
+        self.conn.commit()
+
+    def watermark(self):
+        with self.lock:
+            row = self.conn.execute("SELECT value FROM state WHERE key = 'watermark'").fetchone()
+        return int(row[0]) if row else 0
+
+    def set_watermark(self, signal_id):
+        with self.lock, self.conn:
+            self.conn.execute(
+                "INSERT INTO state (key, value) VALUES ('watermark', ?) "
+                "ON CONFLICT(key) DO UPDATE SET value = excluded.value",
+                (str(int(signal_id)),),
+            )
+
+    def claim(self, unique_key, signal_id=None):
+        """Record a signal as being processed. False if it was already claimed (and did not fail)."""
+        with self.lock, self.conn:
+            cur = self.conn.execute(
+                "INSERT INTO processed (UniqueKey, SignalId, status, claimed_at) VALUES (?, ?, 'pending', ?) "
+                "ON CONFLICT(UniqueKey) DO UPDATE SET status = 'pending', claimed_at = excluded.claimed_at "
+                "WHERE status = 'failed'",
+                (unique_key, signal_id, datetime.now().strftime('%Y-%m-%d %H:%M:%S')),
+            )
+            return cur.rowcount == 1
+
+    def mark_failed(self, unique_key):
+        with self.lock, self.conn:
+            self.conn.execute(
+                "UPDATE processed SET status = 'failed', done_at = ? WHERE UniqueKey = ? AND status = 'pending'",
+                (datetime.now().strftime('%Y-%m-%d %H:%M:%S'), unique_key),
+            )
+
+    def recover_stale(self, max_age=SIGNAL_LEDGER_PENDING_TIMEOUT):
+        """Mark claims pending for longer than max_age seconds as failed. Returns their keys."""
+        cutoff = (datetime.now() - timedelta(seconds=max_age)).strftime('%Y-%m-%d %H:%M:%S')
+        with self.lock, self.conn:
+            keys = [k for (k,) in self.conn.execute(
+                "SELECT UniqueKey FROM processed WHERE status = 'pending' AND claimed_at < ?", (cutoff,)
+            )]
+            self.conn.executemany(
+                "UPDATE processed SET status = 'failed' WHERE UniqueKey = ?", [(k,) for k in keys]
+            )
+        return keys
+
+    def mark_done(self, unique_key):
+        with self.lock, self.conn:
+            self.conn.execute(
+                "UPDATE processed SET status = 'done', done_at = ? WHERE UniqueKey = ?",
+                (datetime.now().strftime('%Y-%m-%d %H:%M:%S'), unique_key),
+            )
+
+    def pending(self):
+        with self.lock:
+            return [k for (k,) in self.conn.execute("SELECT UniqueKey FROM processed WHERE status = 'pending'")]
+
+    def close(self):
+        self.conn.close()
+
+
+BACKENDS = {
+    "sqlite": SqliteSignalStore,
+    "csv": CsvSignalStore,
+}
+
+_store = None
+
+def get_signal_store():
+    """Process-wide store for the backend selected by SIGNAL_STORE_BACKEND."""
+    global _store
+    if _store is None:
+        if SIGNAL_STORE_BACKEND not in BACKENDS:
+            raise ValueError(f"Unknown SIGNAL_STORE_BACKEND {SIGNAL_STORE_BACKEND!r}")
+        _store = BACKENDS[SIGNAL_STORE_BACKEND]()
+    return _store
+
+_ledger = None
+
+def get_signal_ledger():
+    global _ledger
+    if _ledger is None:
+        _ledger = SignalLedger()
+        stale = _ledger.recover_stale()
+        if stale:
+            log.warning("⚠️ %d signals were left pending by an earlier run, marked failed: %s", len(stale), stale)
+    return _ledger
+
+def set_signal_ledger(ledger):
+    """Swap the process-wide ledger, e.g. for an in-memory one during replays."""
+    global _ledger
+    _ledger = ledger
+
+def export_xlsx(store, path=XLSX_PATH):
+    """Write all signals to an Excel sheet for humans."""
+    df = store.read_signals().drop(columns=["SignalId"])
+    df.to_excel(path, index=False)
+    return len(df)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Signal store utilities.")
+    parser.add_argument("--export", nargs="?", const=XLSX_PATH, help=f"export signals to Excel (default {XLSX_PATH})")
+    args = parser.parse_args()
+    if args.export:
+        n = export_xlsx(get_signal_store(), args.export)
+        print(f"📄 Exported {n} signals to {args.export}")
@@ -0,0 +1,291 @@
+import asyncio
+import itertools
+import math
+from collections import defaultdict
+from datetime import datetime, timezone
+
+from eventkit import Event
+from ib_insync import (
+    AccountValue, CommissionReport, ContractDetails, Execution, Fill, OrderStatus, Position, PortfolioItem,
+    PriceIncrement, Ticker, Trade,
+)
+
+from config import SIZING_DEFAULT_NET_LIQUIDATION
+from order_book import book_symbol
+
+# Market rules handed out by reqContractDetails: stocks, forex, JPY forex
+SIM_MARKET_RULES = {
+    1: [PriceIncrement(0, 0.01)],
+    2: [PriceIncrement(0, 0.00005)],
+    3: [PriceIncrement(0, 0.005)],
+}
+
+
+class SimClient:
+    def __init__(self):
+        self.ids = itertools.count(1)
+
+    def getReqId(self):
+        return next(self.ids)
+
+
+class SimulatedIB:
+    """
+    In-process stand-in for ib_insync.IB, covering what order.py, order_book.py,
+    market_data.py and tick.py use. Orders fill against prices fed with
+    set_price(): limits when the price crosses them, trailing stops when the
+    price retraces by trailingAmount from its best level. Child orders wait for
+    their parent to fill. Symbols subscribed with reqMktData get a ticker update
+    (pendingTickersEvent) per price; a disconnect drops the subscriptions, as a
+    new TWS session would. The account starts at cash and reports NetLiquidation
+    and portfolio items after every fill; only USD-quoted P&L is counted in
+    NetLiquidation (other P&L is in its quote currency, see pnl()).
+    """
+
+    def __init__(self, account="SIM", cash=SIZING_DEFAULT_NET_LIQUIDATION):
+        self.account = account
+        self.cash = cash
+        self.client = SimClient()
+        self.connected = False
+        self.newOrderEvent = Event("newOrderEvent")
+        self.openOrderEvent = Event("openOrderEvent")
+        self.orderStatusEvent = Event("orderStatusEvent")
+        self.positionEvent = Event("positionEvent")
+        self.pendingTickersEvent = Event("pendingTickersEvent")
+        self.execDetailsEvent = Event("execDetailsEvent")
+        self.connectedEvent = Event("connectedEvent")
+        self.disconnectedEvent = Event("disconnectedEvent")
+        self.accountValueEvent = Event("accountValueEvent")
+        self.updatePortfolioEvent = Event("updatePortfolioEvent")
+        self._trades = {}  # orderId -> Trade
+        self.prices = {}  # symbol -> last price
+        self.tickers = {}  # symbol -> Ticker of a reqMktData subscription
+        self.trail_extremes = {}  # orderId -> best price seen since the trail went live
+        self.position = defaultdict(float)
+        self.avg_cost = defaultdict(float)
+        self.realized = defaultdict(float)
+        self.fills = []  # (time, symbol, action, qty, price)
+        self.now = datetime.now(timezone.utc)
+
+    # --- connection ---
+    def connect(self, *args, **kwargs):
+        self.connected = True
+        self.connectedEvent.emit()
+        return self
+
+    async def connectAsync(self, *args, **kwargs):
+        return self.connect()
+
+    def disconnect(self):
+        if self.connected:
+            self.connected = False
+            self.tickers.clear()
+            self.disconnectedEvent.emit()
+
+    def isConnected(self):
+        return self.connected
+
+    def sleep(self, secs=0):
+        return True
+
+    def waitOnUpdate(self, timeout=0):
+        return False
+
+    # --- reference data ---
+    def qualifyContracts(self, *contracts):
+        for contract in contracts:
+            if not contract.conId:
+                contract.conId = self.client.getReqId()
+        return list(contracts)
+
+    def _rule_id(self, contract):
+        if contract.secType == "CASH":
+            return 3 if "JPY" in (contract.symbol, contract.currency) else 2
+        return 1
+
+    def reqContractDetails(self, contract):
+        return [ContractDetails(contract=contract, marketRuleIds=str(self._rule_id(contract)))]
+
+    async def reqContractDetailsAsync(self, contract):
+        await asyncio.sleep(0)
+        return self.reqContractDetails(contract)
+
+    def reqMarketRule(self, marketRuleId):
+        return SIM_MARKET_RULES.get(marketRuleId, [])
+
+    async def reqMarketRuleAsync(self, marketRuleId):
+        await asyncio.sleep(0)
+        return self.reqMarketRule(marketRuleId)
+
+    def reqMktData(self, contract, *args, **kwargs):
+        ticker = self.tickers[book_symbol(contract)] = Ticker(contract=contract)
+        return ticker
+
+    def cancelMktData(self, contract):
+        self.tickers.pop(book_symbol(contract), None)
+
+    # --- orders ---
+    def placeOrder(self, contract, order):
+        if order.orderId and order.orderId in self._trades:
+            trade = self._trades[order.orderId]  # modification of a working order
+            trade.order = order
+            self.openOrderEvent.emit(trade)
+            return trade
+        if not order.orderId:
+            order.orderId = self.client.getReqId()
+        order.permId = order.orderId
+        trade = Trade(
+            contract=contract, order=order,
+            orderStatus=OrderStatus(orderId=order.orderId, status="Submitted", remaining=order.totalQuantity),
+            fills=[], log=[],
+        )
+        self._trades[order.orderId] = trade
+        self.newOrderEvent.emit(trade)
+        self.openOrderEvent.emit(trade)
+        self._match(book_symbol(contract))
+        return trade
+
+    def cancelOrder(self, order):
+        trade = self._trades.get(order.orderId)
+        if trade is None or trade.isDone():
+            return trade
+        self._set_status(trade, "Cancelled")
+        # Cancelling a working parent cancels its children, like TWS
+        for child in self._trades.values():
+            if child.order.parentId == order.orderId and not child.isDone():
+                self._set_status(child, "Cancelled")
+        return trade
+
+    def trades(self):
+        return list(self._trades.values())
+
+    def openTrades(self):
+        return [t for t in self._trades.values() if t.isActive()]
+
+    def positions(self):
+        return [
+            Position(self.account, self._contract_for(symbol), qty, self.avg_cost[symbol])
+            for symbol, qty in self.position.items() if qty
+        ]
+
+    def accountValues(self, account=""):
+        return [AccountValue(self.account, "NetLiquidation", str(self.net_liquidation()), "USD", "")]
+
+    def portfolio(self, account=""):
+        return [self._portfolio_item(symbol) for symbol, qty in self.position.items() if qty]
+
+    def _portfolio_item(self, symbol):
+        pos = self.position[symbol]
+        last = self.prices.get(symbol, self.avg_cost[symbol])
+        realized, unrealized = self.pnl().get(symbol, (0.0, 0.0))
+        return PortfolioItem(
+            self._contract_for(symbol), pos, last, pos * last, self.avg_cost[symbol], unrealized, realized, self.account
+        )
+
+    def net_liquidation(self):
+        pnl = self.pnl()
+        return self.cash + sum(sum(pnl[s]) for s in pnl if "." not in s or s.endswith(".USD"))
+
+    # --- simulation ---
+    def set_price(self, symbol, price, time=None):
+        """Feed a price for symbol and fill whatever it triggers."""
+        if time is not None:
+            self.now = time
+        self.prices[symbol] = price
+        ticker = self.tickers.get(symbol)
+        if ticker is not None:
+            ticker.time = self.now
+            ticker.last = ticker.bid = ticker.ask = price
+            self.pendingTickersEvent.emit({ticker})
+        self._match(symbol)
+
+    def _contract_for(self, symbol):
+        for trade in self._trades.values():
+            if book_symbol(trade.contract) == symbol:
+                return trade.contract
+        return None
+
+    def _set_status(self, trade, status):
+        trade.orderStatus.status = status
+        trade.orderStatus.filled = trade.filled()
+        trade.orderStatus.remaining = trade.remaining()
+        self.orderStatusEvent.emit(trade)
+
+    def _live(self, trade):
+        parent_id = trade.order.parentId
+        if not trade.isActive():
+            return False
+        return not parent_id or self._trades[parent_id].orderStatus.status == "Filled"
+
+    def _match(self, symbol):
+        price = self.prices.get(symbol)
+        if price is None:
+            return
+        for trade in list(self._trades.values()):
+            if book_symbol(trade.contract) != symbol or not self._live(trade):
+                continue
+            order = trade.order
+            buy = order.action == "BUY"
+            if order.orderType == "LMT":
+                if (buy and price <= order.lmtPrice) or (not buy and price >= order.lmtPrice):
+                    self._fill(trade, order.lmtPrice)
+            elif order.orderType == "TRAIL":
+                best = self.trail_extremes.get(order.orderId, price)
+                best = min(best, price) if buy else max(best, price)
+                self.trail_extremes[order.orderId] = best
+                stop = best + order.trailingAmount if buy else best - order.trailingAmount
+                if (buy and price >= stop) or (not buy and price <= stop):
+                    self._fill(trade, price)
+            elif order.orderType == "STP":
+                if (buy and price >= order.auxPrice) or (not buy and price <= order.auxPrice):
+                    self._fill(trade, price)
+            elif order.orderType == "MKT":
+                self._fill(trade, price)
+
+    def _fill(self, trade, price):
+        order = trade.order
+        symbol = book_symbol(trade.contract)
+        qty = trade.remaining()
+        signed = qty if order.action == "BUY" else -qty
+        execution = Execution(
+            execId=f"sim-{order.orderId}", time=self.now, acctNumber=self.account,
+            side="BOT" if order.action == "BUY" else "SLD", shares=qty, price=price,
+            orderId=order.orderId, permId=order.permId,
+        )
+        fill = Fill(trade.contract, execution, CommissionReport(), self.now)
+        trade.fills.append(fill)
+        self._apply_position(symbol, signed, price)
+        self.fills.append((self.now, symbol, order.action, qty, price))
+        self._set_status(trade, "Filled")
+        self.execDetailsEvent.emit(trade, fill)
+        self.positionEvent.emit(
+            Position(self.account, trade.contract, self.position[symbol], self.avg_cost[symbol])
+        )
+        self.updatePortfolioEvent.emit(self._portfolio_item(symbol))
+        self.accountValueEvent.emit(self.accountValues()[0])
+        self._match(symbol)  # children of this order may now be live
+
+    def _apply_position(self, symbol, signed, price):
+        pos = self.position[symbol]
+        if pos == 0 or math.copysign(1, pos) == math.copysign(1, signed):
+            total = pos + signed
+            self.avg_cost[symbol] = (self.avg_cost[symbol] * abs(pos) + price * abs(signed)) / abs(total)
+            self.position[symbol] = total
+            return
+        closed = min(abs(pos), abs(signed))
+        self.realized[symbol] += closed * (price - self.avg_cost[symbol]) * math.copysign(1, pos)
+        total = pos + signed
+        if total == 0:
+            self.avg_cost[symbol] = 0.0
+        elif math.copysign(1, total) != math.copysign(1, pos):
+            self.avg_cost[symbol] = price  # flipped through flat
+        self.position[symbol] = total
+
+    def pnl(self):
+        """{symbol: (realized, unrealized)} marked at the last fed price."""
+        result = {}
+        for symbol in set(self.position) | set(self.realized):
+            pos = self.position[symbol]
+            last = self.prices.get(symbol, self.avg_cost[symbol])
+            result[symbol] = (self.realized[symbol], pos * (last - self.avg_cost[symbol]))
+        return result
@@ -0,0 +1,197 @@
+"""
+Position sizing against the live account.
+
+AccountState follows IB's account stream (accountValueEvent /
+updatePortfolioEvent, which ib_insync subscribes to on connect) into an
+in-memory copy, so sizing a batch costs one snapshot() and no broker request.
+size_batch sizes every signal of a batch at once:
+
+    Stock  net liquidation x leverage x SIZING_CAPITAL_USAGE x PercentCapital / LastPrice
+    Forex  FixedForexUSD
+
+then cuts sizes so that, taking the batch in order,
+- a symbol's notional (position + working orders + new pyramid) stays within
+  SIZING_MAX_SYMBOL_FRACTION x net liquidation x the symbol's leverage
+- the gross notional of the account stays within SIZING_MAX_GROSS_LEVERAGE x net liquidation
+  (no cap by default)
+Cut signals are logged as a warning.
+"""
+import logging
+import threading
+import time
+
+import numpy as np
+import pandas as pd
+
+from config import (
+    IB_ACCOUNT, SIZING_CAPITAL_USAGE, SIZING_DEFAULT_NET_LIQUIDATION, SIZING_MAX_GROSS_LEVERAGE,
+    SIZING_MAX_SYMBOL_FRACTION,
+)
+from order_book import book_symbol
+
+log = logging.getLogger(__name__)
+
+# Account values kept from the stream (in the account's base currency)
+ACCOUNT_TAGS = {"NetLiquidation", "GrossPositionValue", "AvailableFunds", "BuyingPower"}
+
+
+class AccountSnapshot:
+    """
+    Point-in-time account figures for one sizing pass:
+    net_liquidation  account value sizes are computed from
+    positions        {symbol: notional of the position (see unit_notional)}
+    working          {symbol: quantity working entry orders would add to the position if they filled}
+    """
+
+    __slots__ = ("net_liquidation", "positions", "working", "max_symbol_fraction", "max_gross_leverage")
+
+    def __init__(self, net_liquidation=SIZING_DEFAULT_NET_LIQUIDATION, positions=None, working=None,
+                 max_symbol_fraction=SIZING_MAX_SYMBOL_FRACTION, max_gross_leverage=SIZING_MAX_GROSS_LEVERAGE):
+        self.net_liquidation = net_liquidation
+        self.positions = positions or {}
+        self.working = working or {}
+        self.max_symbol_fraction = max_symbol_fraction
+        self.max_gross_leverage = max_gross_leverage
+
+
+class AccountState:
+    """Account values and portfolio of one account, kept current from the IB event stream."""
+
+    def __init__(self, ib=None, account=IB_ACCOUNT):
+        self.account = account
+        self.values = {}  # tag -> float
+        self.portfolio = {}  # symbol -> PortfolioItem
+        self.updated = None
+        self.lock = threading.Lock()
+        if ib is not None:
+            self.attach(ib)
+
+    def attach(self, ib):
+        ib.accountValueEvent += self.on_account_value
+        ib.updatePortfolioEvent += self.on_portfolio
+        for value in ib.accountValues():
+            self.on_account_value(value)
+        for item in ib.portfolio():
+            self.on_portfolio(item)
+        return self
+
+    def on_account_value(self, value):
+        if value.tag not in ACCOUNT_TAGS or (self.account and value.account != self.account):
+            return
+        try:
+            number = float(value.value)
+        except ValueError:
+            return
+        with self.lock:
+            self.values[value.tag] = number
+            self.updated = time.time()
+
+    def on_portfolio(self, item):
+        if self.account and item.account != self.account:
+            return
+        symbol = book_symbol(item.contract)
+        with self.lock:
+            if item.position:
+                self.portfolio[symbol] = item
+            else:
+                self.portfolio.pop(symbol, None)
+            self.updated = time.time()
+
+    def snapshot(self, book=None):
+        """An AccountSnapshot for one batch; working orders come from the OrderBook when given."""
+        with self.lock:
+            net_liquidation = self.values.get("NetLiquidation")
+            items = list(self.portfolio.items())
+        if not net_liquidation or net_liquidation <= 0:
+            log.warning("⚠️ No NetLiquidation from IB yet, sizing from %s", SIZING_DEFAULT_NET_LIQUIDATION,
+                        extra={"rate_key": "sizing.no_account"})
+            net_liquidation = SIZING_DEFAULT_NET_LIQUIDATION
+        symbols = [symbol for symbol, _ in items]
+        held = {symbol: item.position for symbol, item in items}
+        unit = unit_notional(
+            symbols, ["Forex" if item.contract.secType == "CASH" else "Stock" for _, item in items],
+            [item.marketPrice for _, item in items],
+        )
+        positions = {symbol: abs(held[symbol]) * u for symbol, u in zip(symbols, unit)}
+        working = {}
+        if book is not None:
+            # Entries only: a pyramid's trailing stop would otherwise net against its own entries.
+            # Either side's entries may fill on their own, so the larger resulting position counts.
+            for symbol in list(book.live):
+                pos = held.get(symbol, 0.0)
+                buy, sell = book.entry_quantities(symbol)
+                working[symbol] = max(abs(pos + buy), abs(pos - sell)) - abs(pos)
+        return AccountSnapshot(net_liquidation, positions, working)
+
+
+account_state = None
+
+def get_account_state(ib):
+    """The session's account state, attached to ib on first use."""
+    global account_state
+    if account_state is None:
+        account_state = AccountState(ib)
+    return account_state
+
+
+def unit_notional(symbols, asset_type, price):
+    """
+    Account-currency value of one unit: price for stocks; for forex (units of the
+    base currency) 1 when USD is the base, price when USD is the quote, and 1 for
+    crosses, which treats a base unit as worth about a dollar.
+    """
+    symbols = pd.Series(symbols).astype(str)
+    quote_usd = symbols.str.endswith(".USD").to_numpy()
+    is_forex = np.asarray(asset_type) == "Forex"
+    return np.where(is_forex & ~quote_usd, 1.0, price)
+
+def _capped(requested, headroom, groups=None):
+    """
+    Allocate requested amounts in order until headroom runs out (per group when given):
+    each row gets min(headroom, cumsum up to it) - min(headroom, cumsum before it).
+    """
+    requested = pd.Series(requested)
+    cumsum = requested.groupby(groups).cumsum() if groups is not None else requested.cumsum()
+    through = np.minimum(headroom, cumsum.to_numpy())
+    before = np.minimum(headroom, (cumsum - requested).to_numpy())
+    return np.maximum(through - before, 0.0)
+
+def size_batch(symbols, asset_type, leverage, percent_capital, fixed_forex, price, levels, account=None):
+    """
+    Per-order quantity for each signal of a batch (all arguments are aligned arrays).
+    levels is the number of pyramid orders the quantity is sent at; limits are
+    checked on quantity x levels. Rows cut to zero should not be traded.
+    """
+    account = account or AccountSnapshot()
+    symbols = pd.Series(symbols).reset_index(drop=True).astype(str)
+    asset_type = np.asarray(asset_type, dtype=object)
+    leverage = np.asarray(leverage, dtype=float)
+    price = np.asarray(price, dtype=float)
+    levels = np.maximum(np.asarray(levels, dtype=float), 1)
+    nl = account.net_liquidation
+
+    stock_size = np.floor(nl * leverage * SIZING_CAPITAL_USAGE * np.asarray(percent_capital, dtype=float) / price)
+    forex_size = np.asarray(fixed_forex, dtype=float)
+    size = np.select([asset_type == "Stock", asset_type == "Forex"], [stock_size, forex_size], 0)
+    size = np.where(np.isfinite(size), size, 0)
+    if not np.isfinite(account.max_symbol_fraction) and not np.isfinite(account.max_gross_leverage):
+        return size
+
+    unit = unit_notional(symbols, asset_type, price)
+    requested = np.nan_to_num(size * levels * unit)
+    held = symbols.map(account.positions).fillna(0.0).to_numpy(float)
+    pending = np.nan_to_num(symbols.map(account.working).fillna(0.0).to_numpy(float) * unit)
+    symbol_headroom = np.maximum(account.max_symbol_fraction * nl * leverage - held - pending, 0.0)
+    allowed = _capped(requested, symbol_headroom, groups=symbols)
+
+    # Working orders are valued at the batch's price, so only the batch's symbols count them
+    first = ~symbols.duplicated().to_numpy()
+    gross = sum(account.positions.values()) + float(pending[first].sum())
+    allowed = _capped(allowed, max(account.max_gross_leverage * nl - gross, 0.0))
+
+    cut = allowed < requested - 1e-9
+    if cut.any():
+        log.warning("📏 Sizing limits cut %d of %d signals: %s", int(cut.sum()), len(cut), sorted(set(symbols[cut])),
+                    extra={"rate_key": "sizing.cut"})
+    capped = np.floor(np.divide(allowed, levels * unit, out=np.zeros_like(allowed), where=levels * unit > 0))
+    return np.where(cut, np.minimum(capped, size), size)
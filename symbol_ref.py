@@ -0,0 +1,71 @@
+import os
+import threading
+
+import pandas as pd
+
+from config import TICK_PATH
+
+
+class SymbolReferenceCache:
+    """
+    Process-wide cache of the symbol sheet. The file is parsed once and only
+    re-read when its mtime or size changes; hits/reloads count each access.
+    """
+
+    def __init__(self, path=TICK_PATH, sheet_name="Sheet1"):
+        self.path = path
+        self.sheet_name = sheet_name
+        self.lock = threading.Lock()
+        self.signature = None
+        self.hits = 0
+        self.reloads = 0
+        self._frame = None
+        self._config_frame = None
+        self._config = {}
+        self._quote_ticks = {}
+
+    def _refresh(self):
+        st = os.stat(self.path)
+        signature = (st.st_mtime_ns, st.st_size)
+        with self.lock:
+            if signature == self.signature:
+                self.hits += 1
+                return
+            frame = pd.read_excel(self.path, sheet_name=self.sheet_name)
+            self._frame = frame
+            self._config_frame = frame.set_index("Symbol")
+            self._config = self._config_frame.to_dict(orient="index")
+            self._quote_ticks = frame.set_index("Symbol")["QuoteTick"].to_dict()
+            self.signature = signature
+            self.reloads += 1
+
+    def frame(self):
+        """A copy of the sheet, safe to modify and write back."""
+        self._refresh()
+        return self._frame.copy()
+
+    def config(self):
+        """Symbol -> {column: value}, as load_symbol_config used to return it."""
+        self._refresh()
+        return self._config
+
+    def config_frame(self):
+        """The sheet indexed by Symbol, shared (do not modify): what the batch computations read columns from."""
+        self._refresh()
+        return self._config_frame
+
+    def quote_ticks(self):
+        self._refresh()
+        return self._quote_ticks
+
+    def stats(self):
+        return {"hits": self.hits, "reloads": self.reloads}
+
+
+_cache = None
+
+def get_symbol_cache():
+    global _cache
+    if _cache is None:
+        _cache = SymbolReferenceCache()
+    return _cache
@@ -0,0 +1,36 @@
+import numpy as np
+
+from capture import FrameDiff
+
+
+def frame(rows_lit=()):
+    image = np.full((200, 400, 3), 255, dtype=np.uint8)
+    for y in rows_lit:
+        image[y:y + 20, 50:350] = 0
+    return image
+
+
+def test_unchanged_frame_has_no_band():
+    diff = FrameDiff()
+    assert diff.dirty_band(frame()) == (0, 200)
+    diff.commit()
+    assert diff.dirty_band(frame()) is None
+
+
+def test_band_covers_the_change():
+    diff = FrameDiff()
+    diff.dirty_band(frame())
+    diff.commit()
+    y0, y1 = diff.dirty_band(frame([100]))
+    assert y0 <= 100 and y1 >= 120 and y1 - y0 < 60
+
+
+def test_band_stays_dirty_until_committed():
+    diff = FrameDiff()
+    diff.dirty_band(frame())
+    diff.commit()
+    first = diff.dirty_band(frame([100]))
+    # Processing of that band failed: no commit, the same change is reported again
+    assert diff.dirty_band(frame([100])) == first
+    diff.commit()
+    assert diff.dirty_band(frame([100])) is None
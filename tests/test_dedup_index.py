@@ -0,0 +1,50 @@
+"""DedupIndex: fingerprints reach SQLite only once their rows are persisted, and expire by signal time."""
+import time
+
+from dedup_index import DedupIndex
+
+
+def test_claimed_keys_are_pending_until_recorded(tmp_path):
+    index = DedupIndex(tmp_path / "dedup.db")
+    assert index.claim([1, 2, 2]) == [True, True, False]
+    # Pending: later frames skip the rows, but nothing is on disk yet
+    assert index.claim([1, 3]) == [False, True]
+    assert index.is_empty()
+
+    index.record([1, 2], [time.time()] * 2)
+    reopened = DedupIndex(tmp_path / "dedup.db")
+    assert reopened.claim([1, 2, 3]) == [False, False, True]
+
+
+def test_released_keys_are_new_again(tmp_path):
+    index = DedupIndex(tmp_path / "dedup.db")
+    assert index.claim([1, 2]) == [True, True]
+    index.release([1, 2])
+    assert index.claim([1, 2]) == [True, True]
+
+
+def test_expiry_goes_by_signal_time(tmp_path):
+    index = DedupIndex(tmp_path / "dedup.db", window=3600)
+    now = time.time()
+    index.record([1, 2], [now - 7200, now - 60])
+    index.expire(force=True)
+    index.recent.clear()
+    assert index.claim([1, 2]) == [True, False]
+
+
+def test_signals_outside_the_window_are_not_stored_or_new(tmp_path):
+    index = DedupIndex(tmp_path / "dedup.db", window=3600)
+    now = time.time()
+    index.record([1], [now - 7200])
+    assert index.is_empty()
+    index.recent.clear()
+    assert index.claim([1, 2], [now - 7200, now]) == [False, True]
+
+
+def test_migration_is_remembered_when_every_row_is_too_old(tmp_path):
+    index = DedupIndex(tmp_path / "dedup.db", window=3600)
+    assert not index.migrated()
+    index.record([1, 2], [0, 0])
+    index.mark_migrated()
+    reopened = DedupIndex(tmp_path / "dedup.db", window=3600)
+    assert reopened.is_empty() and reopened.migrated()
@@ -0,0 +1,76 @@
+"""IBPool over SimulatedIB connections: symbol sharding, the shared OrderBook and reconnects."""
+import asyncio
+
+import ib_pool
+from ib_pool import IBPool
+from order import limit_order, make_contract
+from order_book import OrderBook
+from sim_broker import SimulatedIB
+
+CLIENT_IDS = {"orders": [1, 2, 3], "market_data": [4], "reference": [5]}
+SYMBOLS = ["EUR.USD", "AUD.CHF", "NZD.JPY", "AUD.JPY", "GBP.USD", "USD.CAD", "AAPL", "MSFT", "TSLA", "NVDA"]
+
+
+def make_pool():
+    return IBPool(CLIENT_IDS, factory=SimulatedIB).connect()
+
+
+def test_symbol_always_maps_to_the_same_order_connection():
+    pool, other = make_pool(), make_pool()
+    owners = {symbol: pool._shard(symbol).client_id for symbol in SYMBOLS}
+    for _ in range(3):
+        for symbol in SYMBOLS:
+            assert pool.for_symbol(symbol) is pool._shard(symbol).ib
+            assert pool._shard(symbol).client_id == owners[symbol]
+            # Stable across processes too (crc32, not hash())
+            assert other._shard(symbol).client_id == owners[symbol]
+    assert set(owners.values()) <= set(CLIENT_IDS["orders"])
+    assert len(set(owners.values())) > 1
+
+
+def test_order_book_keeps_same_order_id_from_two_connections_apart():
+    pool = make_pool()
+    book = OrderBook()
+    for ib in pool.order_ibs():
+        book.attach(ib)
+    owner, other = pool._shard("EUR.USD").ib, next(ib for ib in pool.order_ibs() if ib is not pool.for_symbol("EUR.USD"))
+
+    # Order ids are per connection: the symbol's own order and one seen on another
+    # client id (e.g. placed in TWS) can carry the same id
+    ours, theirs = limit_order(1000, 1.1, "BUY"), limit_order(500, 1.2, "SELL")
+    ours.orderId = theirs.orderId = 7
+    pool.submit_orders([("EUR.USD", "Forex", ours)])
+    other.placeOrder(make_contract("EUR.USD", "Forex"), theirs)
+    assert len(book.orders("EUR.USD")) == 2
+    assert book.exposure("EUR.USD") == 500
+
+    other.cancelOrder(theirs)
+    assert [t.order for t in book.orders("EUR.USD")] == [ours]
+    owner.cancelOrder(ours)
+    assert book.orders("EUR.USD") == []
+
+
+def test_reconnects_after_disconnected_event(monkeypatch):
+    monkeypatch.setattr(ib_pool, "IB_RECONNECT_DELAY", 0.01)
+    pool = make_pool()
+    connection = pool._shard("EUR.USD")
+
+    async def drop_and_wait():
+        connection.ib.disconnect()  # emits disconnectedEvent
+        assert not connection.ib.isConnected()
+        for _ in range(100):
+            await asyncio.sleep(0.01)
+            if connection.ib.isConnected():
+                return
+
+    asyncio.run(drop_and_wait())
+    assert connection.ib.isConnected()
+    assert not connection.reconnecting
+
+
+def test_ensure_reconnects_outside_the_event_loop():
+    pool = make_pool()
+    ib = pool.for_symbol("EUR.USD")
+    ib.disconnect()
+    assert pool.for_symbol("EUR.USD") is ib
+    assert ib.isConnected()
@@ -0,0 +1,76 @@
+"""TrailingStopManager against SimulatedIB: quotes in, TRAIL amendments out."""
+import pytest
+
+import order_book
+from ib_pool import IBPool
+from market_data import MarketDataTable, TrailingStopManager
+from order import limit_order, submit_orders, trailing_stop_order
+from order_book import OrderBook
+from sim_broker import SimulatedIB
+
+
+@pytest.fixture
+def sim(monkeypatch):
+    ib = SimulatedIB().connect()
+    monkeypatch.setattr(order_book, "order_book", OrderBook(ib))
+    return ib
+
+
+def open_long(ib, symbol="EUR.USD", entry=1.1000):
+    """A filled 1000 BUY at entry with a working TRAIL stop; returns the stop's trade."""
+    ib.set_price(symbol, entry + 0.001)
+    submit_orders(ib, [(symbol, "Forex", limit_order(1000, entry, "BUY"))])
+    ib.set_price(symbol, entry)
+    return submit_orders(ib, [(symbol, "Forex", trailing_stop_order(1000, 0.01, "BUY"))])[0]
+
+
+def test_resubscribes_after_reconnect(sim):
+    stop = open_long(sim)
+    manager = TrailingStopManager(IBPool.wrap(sim)).start()
+    sim.set_price("EUR.USD", 1.1001)
+    assert stop.order.trailingAmount == pytest.approx(0.0002)
+
+    sim.disconnect()
+    assert "EUR.USD" not in sim.tickers
+    sim.connect()
+    assert "EUR.USD" in sim.tickers
+    sim.set_price("EUR.USD", 1.1040)  # 36 bps: the 25 bps band
+    assert stop.order.trailingAmount == pytest.approx(0.0025)
+    assert manager.stop_bps == {"EUR.USD": 25}
+
+
+def test_reconnect_drops_symbols_closed_meanwhile(sim):
+    open_long(sim)
+    manager = TrailingStopManager(IBPool.wrap(sim), MarketDataTable(capacity=1)).start()
+    sim.disconnect()
+    sim.position["EUR.USD"] = 0  # flattened while the socket was down, no positionEvent seen
+    sim.connect()
+    assert manager.contracts == {}
+    assert manager.table.free == [0]
+
+
+def test_band_change_amends_the_trail_in_place(sim):
+    stop = open_long(sim)
+    manager = TrailingStopManager(IBPool.wrap(sim)).start()
+    order_id, orders = stop.order.orderId, len(sim.trades())
+
+    sim.set_price("EUR.USD", 1.1001)
+    assert stop.order.trailingAmount == pytest.approx(0.0002)
+    sim.set_price("EUR.USD", 1.1040)  # 36 bps: the 25 bps band
+    assert stop.order.trailingAmount == pytest.approx(0.0025)
+    assert stop.order.orderId == order_id
+    assert len(sim.trades()) == orders
+    assert stop.isActive() and manager.stop_bps == {"EUR.USD": 25}
+
+
+def test_going_flat_unsubscribes_and_frees_the_slot(sim):
+    stop = open_long(sim)
+    manager = TrailingStopManager(IBPool.wrap(sim), MarketDataTable(capacity=1)).start()
+    assert "EUR.USD" in manager.contracts and manager.table.free == []
+
+    sim.set_price("EUR.USD", 1.1001)
+    sim.set_price("EUR.USD", 1.0990)  # through the 2 bps trail: the stop fills
+    assert stop.orderStatus.status == "Filled"
+    assert manager.contracts == {} and manager.positions == {}
+    assert "EUR.USD" not in sim.tickers
+    assert manager.table.free == [0]
@@ -0,0 +1,49 @@
+"""Order groups against SimulatedIB: finished groups are dropped and only real cancels count; wait_for_fills."""
+import pytest
+
+import order
+from order import cancel_symbol_groups, limit_order, register_group, signal_group_requests, submit_orders, wait_for_fills
+from sim_broker import SimulatedIB
+
+
+@pytest.fixture(autouse=True)
+def no_groups(monkeypatch):
+    monkeypatch.setattr(order, "order_groups", {})
+
+
+def send_group(ib, symbol, prices, trail_amount=None):
+    group, requests = signal_group_requests(ib, symbol, "Forex", 1000, prices, "BUY", trail_amount)
+    register_group(group, submit_orders(ib, requests))
+    return group
+
+
+def test_finished_groups_are_dropped():
+    ib = SimulatedIB().connect()
+    ib.set_price("EUR.USD", 1.20)
+    ib.set_price("GBP.USD", 1.40)
+    filled = send_group(ib, "EUR.USD", [1.10])
+    ib.set_price("EUR.USD", 1.05)
+    assert filled.done()
+
+    working = send_group(ib, "GBP.USD", [1.30])
+    assert order.order_groups == {"GBP.USD": [working]}
+
+
+def test_cancel_reports_only_groups_it_cancelled():
+    ib = SimulatedIB().connect()
+    ib.set_price("EUR.USD", 1.20)
+    send_group(ib, "EUR.USD", [1.10])
+    ib.set_price("EUR.USD", 1.05)
+    assert not cancel_symbol_groups(ib, "EUR.USD")
+
+    group = send_group(ib, "EUR.USD", [1.00, 0.99], trail_amount=0.01)
+    assert cancel_symbol_groups(ib, "EUR.USD")
+    assert group.done()
+    assert not cancel_symbol_groups(ib, "EUR.USD")
+
+
+def test_wait_for_fills_returns_the_filled_trades():
+    ib = SimulatedIB().connect()
+    ib.set_price("EUR.USD", 1.20)
+    trades = submit_orders(ib, [("EUR.USD", "Forex", limit_order(1000, price, "BUY")) for price in (1.21, 1.10)])
+    assert wait_for_fills(ib, trades + [None], timeout=0.1) == trades[:1]
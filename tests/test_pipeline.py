@@ -0,0 +1,44 @@
+"""pipeline.trading_loop: a batch whose orders fail is retried with backoff, then given up."""
+import asyncio
+
+import pandas as pd
+
+import ibkr
+import pipeline
+from row_parser import parse_rows
+
+LINE = "2025-08-13 08:13:21 AUD.CHF LongTrigger 0.52635 0.52645 0.52640 0.52663 -2.016 0.070"
+
+
+def run_trading_loop(monkeypatch, failures):
+    calls = []
+
+    def place_signals(ib, sd_df):
+        calls.append(len(sd_df))
+        if len(calls) <= failures:
+            raise ConnectionError("socket closed")
+        return len(sd_df)
+
+    monkeypatch.setattr(pipeline, "backoff_delays", lambda attempts: [0.01] * (attempts - 1))
+    monkeypatch.setattr(ibkr, "account_snapshot", lambda ib: None)
+    monkeypatch.setattr(ibkr, "prepare_signals", lambda raw, account: pd.DataFrame({"Symbol": raw["Symbol"]}))
+    monkeypatch.setattr(ibkr, "place_signals", place_signals)
+
+    async def main():
+        queue = asyncio.Queue()
+        queue.put_nowait((0.0, parse_rows([[LINE]]), 0))
+        task = asyncio.ensure_future(pipeline.trading_loop(None, queue))
+        await asyncio.sleep(0.2)
+        queue.put_nowait(None)
+        await task
+
+    asyncio.run(main())
+    return calls
+
+
+def test_failed_batch_is_retried(monkeypatch):
+    assert run_trading_loop(monkeypatch, failures=2) == [1, 1, 1]
+
+
+def test_batch_is_given_up_after_the_last_attempt(monkeypatch):
+    assert len(run_trading_loop(monkeypatch, failures=100)) == pipeline.IB_ORDER_RETRY_ATTEMPTS
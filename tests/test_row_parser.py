@@ -0,0 +1,87 @@
+"""parse_rows on the rows of previous_source.xlsx and on the OCR misreads seen in the table."""
+import pytest
+from openpyxl import load_workbook
+
+import row_parser
+from row_parser import NUMERIC_COLUMNS, parse_rows
+
+LINE = "2025-08-13 07:53:00 USDJPY. LongTrigger 147.235 147.241 147.238 147.315 -2.500 -0.320"
+
+
+def source_rows():
+    workbook = load_workbook("previous_source.xlsx", read_only=True)
+    return list(workbook.active.iter_rows(values_only=True))
+
+
+def parse_line(line):
+    return parse_rows([[line]])
+
+
+def test_previous_source_rows_all_parse():
+    rows = source_rows()
+    batch = parse_rows(rows)
+    assert batch.rejects.empty
+    assert len(batch.signals) == len(rows)
+    assert (batch.signals[NUMERIC_COLUMNS].dtypes == "float64").all()
+    assert set(batch.text["Symbol"]) >= {"NZD.JPY", "AUD.CHF", "USD.JPY"}
+    usdjpy = batch.text[batch.text["Symbol"] == "USD.JPY"].iloc[0]
+    assert usdjpy["SignalTime"] == "07:53:00" and usdjpy["Signal"] == "LongTrigger"
+
+
+def test_glued_date_and_time():
+    batch = parse_line(LINE.replace("2025-08-13 07:53:00", "2025-08-1307:53:00"))
+    assert batch.keys().tolist() == ["2025-08-13_07:53:00_USD.JPY"]
+
+
+def test_datetime_confusions_and_seconds_past_59():
+    batch = parse_line(LINE.replace("2025-08-13 07:53:00", "2O25-O8-l3 07:53:6S"))
+    assert batch.keys().tolist() == ["2025-08-13_07:53:59_USD.JPY"]
+
+
+@pytest.mark.parametrize("misread, text, value", [
+    ("o315", "9.315", 9.315),      # leading 'o' without a point: '9.'
+    ("o.315", "9.315", 9.315),     # the point was read: just '9'
+    ("1o7.238", "197.238", 197.238),
+    ("147,315", "147.315", 147.315),
+])
+def test_numeric_repairs(misread, text, value):
+    batch = parse_line(LINE.replace("147.315", misread))
+    assert batch.text["EqPrice"].tolist() == [text]
+    assert batch.signals["EqPrice"].tolist() == [value]
+
+
+def test_symbols_resolve_through_the_sheet_universe():
+    batch = parse_rows([[LINE.replace("USDJPY.", symbol)] for symbol in ["EURUSD", "NZD.JPY", "EUR.U5D", "usd-jpy"]])
+    assert batch.text["Symbol"].tolist() == ["EUR.USD", "NZD.JPY", "EUR.USD", "USD.JPY"]
+
+
+def test_without_a_sheet_six_letters_is_a_pair(monkeypatch):
+    monkeypatch.setattr(row_parser, "symbol_universe", lambda: None)
+    batch = parse_rows([[LINE.replace("USDJPY.", symbol)] for symbol in ["EURUSD", "AAPL"]])
+    assert batch.text["Symbol"].tolist() == ["EUR.USD", "AAPL"]
+
+
+def test_extra_trailing_fields_are_ignored():
+    batch = parse_line(LINE + " 0.125 extra")
+    assert batch.rejects.empty
+    assert batch.signals["Bias"].tolist() == [-0.32]
+
+
+def test_reject_reasons():
+    lines = [
+        "2025-08-13 07:53:00 USDJPY. LongTrigger 147.235",
+        LINE.replace("2025-08-13", "2025-0B-1X"),
+        LINE.replace("07:53:00", "07:5X:00"),
+        LINE.replace("USDJPY.", "QQQZZZ"),
+        LINE.replace("LongTrigger", "Flat"),
+        LINE.replace("147.241", "14?.241"),
+        LINE,
+    ]
+    batch = parse_rows([[line] for line in lines] + [[None], []])
+    assert batch.rejects["Reason"].tolist() == [
+        "too few fields", "bad date", "bad time", "unknown symbol", "unknown signal", "bad AskPrice",
+        "too few fields", "too few fields",
+    ]
+    assert batch.rejects["Line"].tolist()[:6] == lines[:6]
+    assert batch.signals.index.tolist() == [6]
+    assert len(batch) == 9
@@ -0,0 +1,56 @@
+"""SignalLedger claims: no signal is left 'pending' when placing its orders fails."""
+import pandas as pd
+import pytest
+
+import ibkr
+import order_book
+import signal_store
+import sizing
+from benchmark import synthetic_signals
+from ib_pool import IBPool
+from order_book import OrderBook
+from signal_store import SignalLedger
+from sim_broker import SimulatedIB
+from sizing import AccountState
+
+
+def test_failed_claim_can_be_claimed_again():
+    ledger = SignalLedger(":memory:")
+    assert ledger.claim("k", 1)
+    assert not ledger.claim("k", 1)
+    ledger.mark_failed("k")
+    assert ledger.claim("k", 1)
+    ledger.mark_done("k")
+    ledger.mark_failed("k")
+    assert not ledger.claim("k", 1)
+
+
+def test_recover_stale_marks_old_pending_claims_failed():
+    ledger = SignalLedger(":memory:")
+    ledger.claim("old")
+    assert ledger.recover_stale(max_age=3600) == []
+    assert ledger.recover_stale(max_age=-1) == ["old"]
+    assert ledger.pending() == []
+    assert ledger.claim("old")
+
+
+def test_submit_error_marks_claims_failed(monkeypatch):
+    sim = SimulatedIB().connect()
+    ledger = SignalLedger(":memory:")
+    monkeypatch.setattr(signal_store, "_ledger", ledger)
+    monkeypatch.setattr(order_book, "order_book", OrderBook(sim))
+    monkeypatch.setattr(sizing, "account_state", AccountState(sim))
+
+    def broken_submit(self, requests):
+        raise ConnectionError("socket closed")
+    monkeypatch.setattr(IBPool, "submit_orders", broken_submit)
+
+    raw = synthetic_signals(20, seed=3)
+    for symbol, price in zip(raw["Symbol"], pd.to_numeric(raw["LastPrice"])):
+        sim.set_price(symbol, price)
+    with pytest.raises(ConnectionError):
+        ibkr.handle_signals(sim, raw)
+
+    keys = ledger.conn.execute("SELECT UniqueKey, status FROM processed").fetchall()
+    assert keys and {status for _, status in keys} == {"failed"}
+    assert ledger.pending() == []
@@ -0,0 +1,69 @@
+"""The vectorized signal engine (ibkr.compute_signal_columns) against the scalar per-row functions."""
+import numpy as np
+import pytest
+
+import ibkr
+from benchmark import SYMBOL_CONFIG, TICK_SIZES, synthetic_signals
+from sizing import AccountSnapshot
+
+# Sizing limits have no scalar counterpart
+UNLIMITED = AccountSnapshot(100000, max_symbol_fraction=np.inf, max_gross_leverage=np.inf)
+
+
+def result_with_sd_rowwise(df, tick_sizes, symbol_config, portfolio_value=100000):
+    """Reference: the per-row apply() implementation built from the scalar ibkr functions."""
+    df = df.copy()
+    df["TickSize"] = df["Symbol"].map(tick_sizes).fillna(0.0001)
+    df["SD"] = df.apply(lambda row: ibkr.compute_sd(row["EqPrice"], row["LastPrice"], row["EqLevel"], row["TickSize"]), axis=1)
+    df["SD_tick"] = df.apply(lambda row: ibkr.compute_sd_tick(row["EqPrice"], row["LastPrice"], row["EqLevel"], row["TickSize"]), axis=1)
+    df = df[df["SD"] > 0].copy()
+    df["WaitDevs"] = df["Symbol"].apply(lambda s: symbol_config.get(s, {}).get("WaitDevs", 1))
+    df["MaxOrders"] = df["Symbol"].apply(lambda s: symbol_config.get(s, {}).get("MaxOrders", 5))
+    df["PositionSize"] = df.apply(
+        lambda row: ibkr.calculate_position_size(
+            row["Symbol"], symbol_config, portfolio_value=portfolio_value,
+            leverage=3 if symbol_config.get(row["Symbol"], {}).get("Type") == "Stock" else 30,
+            last_price=row["LastPrice"],
+        ),
+        axis=1
+    )
+    df["EntryPrice"] = df.apply(lambda row: ibkr.get_entry_price(row["Signal"], row["BidPrice"], row["AskPrice"]), axis=1)
+    df["PyramidOrders"] = df.apply(ibkr.generate_pyramid_orders, axis=1)
+    df["StopLossAction"] = df.apply(ibkr.calc_stop_loss, axis=1)
+    df["CancelRemainingOrders"] = df["StopLossAction"].apply(lambda x: True if x and x.startswith("EXIT") else False)
+    return df
+
+
+@pytest.mark.parametrize("seed", range(25))
+def test_vectorized_matches_scalar(seed):
+    rng = np.random.default_rng(seed)
+    df = synthetic_signals(int(rng.integers(1, 500)), seed=int(rng.integers(1 << 31)))
+    expected = result_with_sd_rowwise(df, TICK_SIZES, SYMBOL_CONFIG)
+    actual = ibkr.compute_signal_columns(df, TICK_SIZES, SYMBOL_CONFIG, UNLIMITED)
+
+    assert list(expected.index) == list(actual.index)
+    for col in ["TickSize", "SD", "SD_tick", "WaitDevs", "MaxOrders", "PositionSize", "EntryPrice"]:
+        np.testing.assert_array_equal(expected[col].to_numpy(float), actual[col].to_numpy(float), err_msg=col)
+    for col in ["StopLossAction", "CancelRemainingOrders"]:
+        assert expected[col].tolist() == actual[col].tolist(), col
+    for e, a in zip(expected["PyramidOrders"], actual["PyramidOrders"]):
+        # np.round vs round may differ in the last float bit
+        assert len(e) == len(a)
+        np.testing.assert_allclose(e, a, rtol=1e-12)
+
+
+def test_stop_loss_progression_vec_matches_scalar():
+    profits = np.concatenate([np.arange(-150, 200, 0.5), [3.999, 4, 6, 10, 15, 25, 34.999, 35, 45, 1000]])
+    expected = [ibkr.stop_loss_progression(p) for p in profits]
+    np.testing.assert_array_equal(ibkr.stop_loss_progression_vec(profits), expected)
+
+
+def test_unknown_signal_gets_no_stop_or_orders():
+    df = synthetic_signals(3, seed=1)
+    df["Signal"] = ["LongTrigger", None, "Sideways"]
+    df["EqLevel"] = 1.0
+    result = ibkr.compute_signal_columns(df, TICK_SIZES, SYMBOL_CONFIG, UNLIMITED)
+    assert result["StopLossAction"].iloc[0].startswith(("TRAIL_SL_", "EXIT_"))
+    assert result["StopLossAction"].iloc[1:].isna().all()
+    assert result["PyramidOrders"].iloc[1:].map(len).tolist() == [0, 0]
+    assert not result["CancelRemainingOrders"].iloc[1:].any()
@@ -0,0 +1,27 @@
+"""sizing.AccountState snapshots: working orders as the position they could add."""
+from order import limit_order, signal_group_requests, submit_orders
+from order_book import OrderBook
+from sim_broker import SimulatedIB
+from sizing import AccountState
+
+
+def test_trailing_stops_do_not_net_against_entries():
+    ib = SimulatedIB().connect()
+    ib.set_price("EUR.USD", 1.20)
+    book = OrderBook(ib)
+    _, requests = signal_group_requests(ib, "EUR.USD", "Forex", 1000, [1.10, 1.09, 1.08], "BUY", 0.01)
+    submit_orders(ib, requests)
+
+    snapshot = AccountState(ib).snapshot(book)
+    assert snapshot.working == {"EUR.USD": 3000}
+
+
+def test_entries_on_both_sides_count_the_larger_position():
+    ib = SimulatedIB().connect()
+    ib.set_price("EUR.USD", 1.20)
+    book = OrderBook(ib)
+    submit_orders(ib, [("EUR.USD", "Forex", limit_order(1000, 1.10, "BUY")),
+                       ("EUR.USD", "Forex", limit_order(2500, 1.30, "SELL"))])
+
+    snapshot = AccountState(ib).snapshot(book)
+    assert snapshot.working == {"EUR.USD": 2500}
@@ -0,0 +1,73 @@
+import cv2
+import pytest
+
+import ocr
+from dedup_index import DedupIndex
+
+# Data rows of table.png span y 59-383 inside the table frame (x 13-1907)
+FULL = cv2.imread("table.png")
+
+
+def blank_rows(frame, y0, y1):
+    frame = frame.copy()
+    frame[y0:y1, 15:1906] = 255
+    return frame
+
+
+@pytest.fixture(autouse=True)
+def fresh_layout():
+    ocr.table_layout = None
+    yield
+    ocr.table_layout = None
+
+
+def row_tops(rows):
+    return [int(r[:, 1].min()) for r in rows]
+
+
+def test_unchanged_frame_reuses_layout():
+    rows = ocr.extract_table(FULL)
+    assert ocr.extract_table(FULL) is rows
+
+
+def test_rows_after_clear_list_are_detected():
+    cleared = blank_rows(FULL, 58, 386)
+    assert len(ocr.split_frames(ocr.extract_table(cleared))[1]) == 0
+    refilled = ocr.extract_table(FULL)
+    assert row_tops(refilled) == row_tops(ocr.extract_table(FULL, use_cache=False))
+    assert len(ocr.split_frames(refilled)[1]) == 11
+
+
+def test_row_added_below_cached_rows_is_detected():
+    ten_rows = blank_rows(FULL, 334, 362)
+    assert len(ocr.split_frames(ocr.extract_table(ten_rows))[1]) == 10
+    grown = ocr.extract_table(FULL)
+    assert row_tops(grown) == row_tops(ocr.extract_table(FULL, use_cache=False))
+    assert len(ocr.split_frames(grown)[1]) == 11
+
+
+def test_data_rows_of_a_cropped_capture():
+    # OCR_CAPTURE_ROI around the rows only: no window or table frame in the frame
+    cropped = FULL[55:388, 15:1906].copy()
+    frames, data = ocr.split_frames(ocr.extract_table(cropped, use_cache=False))
+    assert frames == []
+    assert len(data) == 11
+    assert row_tops(data) == sorted(row_tops(data))
+
+
+def test_frame_with_rejected_row_is_committed(tmp_path, monkeypatch):
+    calls = []
+    def one_unknown_row(image, rows, cache=None):
+        calls.append(len(rows))
+        return [["2025-08-13 08:13:21 ZZZ.QQQ LongTrigger 0.52635 0.52645 0.52640 0.52663 -2.016 0.070", "LongTrigger"]]
+    monkeypatch.setattr(ocr, "ocr_table", one_unknown_row)
+    monkeypatch.setattr(ocr, "frame_diff", ocr.FrameDiff())
+    monkeypatch.setattr(ocr.row_cache, "save", lambda: None)
+    index = DedupIndex(tmp_path / "dedup.db")
+    monkeypatch.setattr(ocr, "get_dedup_index", lambda: index)
+
+    first = ocr.detect_new_rows(FULL)
+    assert len(first.rejects) == 1
+    assert ocr.frame_diff.dirty_band(FULL) is None
+    assert len(ocr.detect_new_rows(FULL)) == 0
+    assert calls == [11]
@@ -0,0 +1,31 @@
+"""tick.update_tick_sizes against SimulatedIB's market rules."""
+import asyncio
+import json
+import shutil
+
+import pandas as pd
+
+import tick
+from config import TICK_LADDER_PATH, TICK_PATH
+from sim_broker import SIM_MARKET_RULES, SimulatedIB
+
+
+def test_update_tick_sizes_writes_rule_ids_and_ladders(tmp_path, monkeypatch):
+    shutil.copy(TICK_PATH, tmp_path / TICK_PATH)
+    monkeypatch.chdir(tmp_path)
+    # util.run needs a current event loop; an earlier asyncio.run() leaves none
+    asyncio.set_event_loop(asyncio.new_event_loop())
+
+    tick.update_tick_sizes(SimulatedIB().connect())
+
+    sheet = pd.read_excel(TICK_PATH)
+    assert sheet["MarketRuleId"].dtype == "int64"
+    forex = sheet["Type"].str.lower() == "forex"
+    jpy = sheet["RealSymbol"].str.contains("JPY")
+    assert (sheet.loc[~forex, "MarketRuleId"] == 1).all()
+    assert (sheet.loc[forex & jpy, "MarketRuleId"] == 3).all()
+    assert (sheet.loc[forex & ~jpy, "MarketRuleId"] == 2).all()
+    assert sheet.loc[forex & jpy, "OrderTick"].eq(SIM_MARKET_RULES[3][0].increment).all()
+
+    ladders = json.loads((tmp_path / TICK_LADDER_PATH).read_text())
+    assert set(ladders) == {"1", "2", "3"}
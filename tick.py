@@ -1,22 +1,82 @@
 from ib_insync import *
-import pandas as pd
+from ib_insync import util
+import asyncio
 import time
 from datetime import datetime
 from config import *
+from ib_pool import IBPool
+from log_setup import setup_logging
+from metrics import observe, start_export, timer
+from symbol_ref import get_symbol_cache
+from tick_ladder import TickLadderIndex
 # ========= SETTINGS =========
 EXCEL_FILE = TICK_PATH
 UPDATE_INTERVAL = TICK_UPDATE_INTERVAL  # seconds
 
 # ========= FUNCTIONS =========
-def get_order_tick_size(contract):
-    details = ib.reqContractDetails(contract)
-    if not details:
-        return None
-    marketRuleId = details[0].marketRuleIds.split(',')[0]
-    if not marketRuleId:
-        return None
-    ticks = ib.reqMarketRule(int(marketRuleId))
-    return ticks[0].increment if ticks else None
+class Pacer:
+    """Spaces requests so no more than `rate` go out per second."""
+
+    def __init__(self, rate):
+        self.interval = 1.0 / rate
+        self.next_slot = 0.0
+
+    async def wait(self):
+        loop = asyncio.get_running_loop()
+        now = loop.time()
+        slot = max(now, self.next_slot)
+        self.next_slot = slot + self.interval
+        if slot > now:
+            await asyncio.sleep(slot - now)
+
+def make_contract(symbol, type_):
+    if type_.lower() == 'stock':
+        return Stock(symbol, 'SMART', 'USD')
+    elif type_.lower() == 'forex':
+        return Forex(symbol)
+    return None
+
+async def resolve_market_rules(ib, symbols, concurrency=TICK_RESOLVE_CONCURRENCY, rate=TICK_MAX_REQUESTS_PER_SEC):
+    """
+    Resolve the market rule of every (symbol, type) concurrently.
+    Only needs ib.reqContractDetailsAsync / ib.reqMarketRuleAsync, so any stub
+    with those two coroutines works. At most `concurrency` requests are in flight,
+    paced to `rate` per second, and each market rule id is requested once.
+    Returns the rule ids in input order (None where unresolved) and
+    {rule id: price increments} for every rule seen.
+    """
+    semaphore = asyncio.Semaphore(concurrency)
+    pacer = Pacer(rate)
+    market_rules = {}  # rule id -> task, shared by every symbol on that rule
+
+    async def request(coro_fn, *args):
+        async with semaphore:
+            await pacer.wait()
+            start = time.perf_counter()
+            result = await coro_fn(*args)
+            observe("tick.ib_request", time.perf_counter() - start)
+            return result
+
+    def market_rule(rule_id):
+        if rule_id not in market_rules:
+            market_rules[rule_id] = asyncio.ensure_future(request(ib.reqMarketRuleAsync, rule_id))
+        return market_rules[rule_id]
+
+    async def resolve(symbol, type_):
+        contract = make_contract(symbol, type_)
+        if contract is None:
+            return None
+        details = await request(ib.reqContractDetailsAsync, contract)
+        if not details:
+            return None
+        rule_id = details[0].marketRuleIds.split(',')[0]
+        if not rule_id:
+            return None
+        await market_rule(int(rule_id))
+        return int(rule_id)
+
+    rule_ids = await asyncio.gather(*(resolve(symbol, type_) for symbol, type_ in symbols))
+    return rule_ids, {rule_id: task.result() for rule_id, task in market_rules.items()}
 
 def get_quote_tick_size(symbol, type_):
     if type_.lower() != 'forex':
@@ -27,40 +87,52 @@ def get_quote_tick_size(symbol, type_):
     else:
         return 0.0001
 
-def update_tick_sizes():
-    df = pd.read_excel(EXCEL_FILE)
-
-    for i, row in df.iterrows():
-        symbol = row['RealSymbol']
-        type_ = row['Type']
-        
-        if type_.lower() == 'stock':
-            contract = Stock(symbol, 'SMART', 'USD')
-        elif type_.lower() == 'forex':
-            contract = Forex(symbol)
-        else:
-            continue
+@timer("tick.update_tick_sizes")
+def update_tick_sizes(ib):
+    df = get_symbol_cache().frame()
+
+    symbols = list(zip(df['RealSymbol'], df['Type']))
+    with timer("tick.resolve_market_rules"):
+        rule_ids, rules = util.run(resolve_market_rules(ib, symbols))
+    now = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
 
-        order_tick = get_order_tick_size(contract)
+    ladders = TickLadderIndex()
+    for rule_id, ticks in rules.items():
+        if ticks:
+            ladders.add_rule(rule_id, ticks)
+    ladders.save()
+
+    for i, (symbol, type_), rule_id in zip(df.index, symbols, rule_ids):
+        if make_contract(symbol, type_) is None:
+            continue
+        ticks = rules.get(rule_id)
+        order_tick = ticks[0].increment if ticks else None
         quote_tick = get_quote_tick_size(symbol, type_)
 
+        df.at[i, 'MarketRuleId'] = rule_id
         df.at[i, 'OrderTick'] = order_tick
         df.at[i, 'QuoteTick'] = quote_tick if quote_tick is not None else order_tick
-        df.at[i, 'LastUpdated'] = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+        df.at[i, 'LastUpdated'] = now
 
-    df.to_excel(EXCEL_FILE, index=False)
+    with timer("tick.write_sheet"):
+        df.to_excel(EXCEL_FILE, index=False)
     print(f"[{datetime.now()}] Updated tick sizes in {EXCEL_FILE}")
 
 # ========= MAIN LOOP =========
-ib = IB()
-ib.connect(IB_HOST, IB_PORT, clientId=IB_CLIENT_ID)  # 7497 = paper
-
-while True:
-    try:
-        update_tick_sizes()
-        time.sleep(UPDATE_INTERVAL)
-    except KeyboardInterrupt:
-        print("Stopping...")
-        break
-
-ib.disconnect()
+def main():
+    setup_logging()
+    pool = IBPool().connect(("reference",))  # its own client id, so it can run beside ibkr.py
+    start_export()
+
+    while True:
+        try:
+            update_tick_sizes(pool.reference())  # reconnects if the socket dropped
+            time.sleep(UPDATE_INTERVAL)
+        except KeyboardInterrupt:
+            print("Stopping...")
+            break
+
+    pool.disconnect()
+
+if __name__ == "__main__":
+    main()
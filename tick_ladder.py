@@ -0,0 +1,90 @@
+import json
+import os
+
+import numpy as np
+
+from config import TICK_LADDER_PATH
+
+
+class TickLadderIndex:
+    """
+    Market rule id -> price bands (lowEdge, increment), as returned by reqMarketRule.
+    Looks up the valid increment for arrays of prices by binary search.
+    """
+
+    def __init__(self):
+        self.rules = {}  # rule id -> (low_edges, increments), sorted by low edge
+
+    def add_rule(self, rule_id, price_increments):
+        """price_increments: PriceIncrement objects or (lowEdge, increment) pairs."""
+        bands = sorted(
+            (p.lowEdge, p.increment) if hasattr(p, "lowEdge") else tuple(p)
+            for p in price_increments
+        )
+        if not bands:
+            return
+        low_edges, increments = zip(*bands)
+        self.rules[int(rule_id)] = (np.array(low_edges, dtype=float), np.array(increments, dtype=float))
+
+    def __contains__(self, rule_id):
+        return rule_id in self.rules
+
+    def increments(self, rule_ids, prices):
+        """
+        Increment that applies to each price. rule_ids is a float array with one entry
+        per row of prices (prices may be 1-D or rows x N); rows whose rule id is NaN
+        or unknown get NaN.
+        """
+        prices = np.asarray(prices, dtype=float)
+        rule_ids = np.asarray(rule_ids, dtype=float)
+        out = np.full(prices.shape, np.nan)
+        for rule_id in np.unique(rule_ids[~np.isnan(rule_ids)]):
+            if int(rule_id) not in self.rules:
+                continue
+            low_edges, increments = self.rules[int(rule_id)]
+            rows = rule_ids == rule_id
+            band = np.searchsorted(low_edges, prices[rows], side="right") - 1
+            out[rows] = increments[np.clip(band, 0, None)]
+        return out
+
+    def snap(self, rule_ids, prices):
+        """
+        Round every price to the nearest valid tick of its rule's band.
+        Prices whose rule is unknown are returned unchanged.
+        """
+        prices = np.asarray(prices, dtype=float)
+        inc = self.increments(rule_ids, prices)
+        snapped = np.round(np.round(prices / inc) * inc, 10)
+        return np.where(np.isnan(inc), prices, snapped)
+
+    def save(self, path=TICK_LADDER_PATH):
+        data = {str(k): list(zip(e.tolist(), i.tolist())) for k, (e, i) in self.rules.items()}
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(data, f, indent=1)
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path=TICK_LADDER_PATH):
+        index = cls()
+        if os.path.exists(path):
+            with open(path, encoding="utf-8") as f:
+                for rule_id, bands in json.load(f).items():
+                    index.add_rule(rule_id, bands)
+        return index
+
+
+_index = None
+_signature = None
+
+def get_tick_ladders(path=TICK_LADDER_PATH):
+    """Shared index, reloaded when the ladder file changes on disk."""
+    global _index, _signature
+    signature = None
+    if os.path.exists(path):
+        st = os.stat(path)
+        signature = (st.st_mtime_ns, st.st_size)
+    if _index is None or signature != _signature:
+        _index = TickLadderIndex.load(path)
+        _signature = signature
+    return _index